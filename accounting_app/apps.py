@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountingAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounting_app'
+
+    def ready(self):
+        # Register signal handlers that keep the P&L snapshots up to date
+        from . import signals  # noqa: F401
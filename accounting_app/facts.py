@@ -0,0 +1,245 @@
+"""
+Daily fact tables for reporting.
+
+The reports used to aggregate raw invoices and expenses over their whole
+range. They now aggregate one row per day instead (at most 366 per year):
+
+- DailySalesFact: revenue, amount paid and invoice count per day
+- DailyExpenseFact: expense amount and count per day and category
+- DailyProductFact: units and revenue per day and product (sale lines
+  linked to a product; backfill_sale_products refreshes the days of the
+  lines it links)
+
+Facts are recomputed per day rather than adjusted by deltas, so refreshing
+a day is idempotent. Saving or deleting an invoice or expense marks its
+day(s) dirty (see signals.py); the dirty days are recomputed once the
+transaction commits, with one grouped query per table for all of them. The
+recomputed rows are upserted (INSERT ... ON CONFLICT UPDATE), so refreshes
+of the same day running at once do not collide on its unique key.
+
+Migration 0006 computes the facts of the data that existed before.
+``manage.py reconcile_daily_facts`` recomputes recent days nightly (or the
+whole history) to catch changes that bypass model signals.
+"""
+
+import threading
+from datetime import datetime
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from sales_app.models import Invoice, Sale
+
+from .models import DailyExpenseFact, DailyProductFact, DailySalesFact, Expense
+
+_pending = threading.local()
+
+
+def as_date(value):
+    """A date from a date or an unsaved default datetime (None stays None)"""
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def _pending_days(using):
+    if not hasattr(_pending, 'days'):
+        _pending.days = {}
+    return _pending.days.setdefault(using, set())
+
+
+def mark_days_dirty(days, using):
+    """
+    Recompute the facts of some days once the current transaction commits.
+
+    Args:
+        days: Dates (None entries are ignored)
+        using: Database alias
+    """
+    days = {as_date(day) for day in days if day}
+    if not days:
+        return
+    _pending_days(using).update(days)
+    # The first callback to run refreshes every pending day; the others find
+    # nothing left. Days of a rolled back transaction are refreshed with the
+    # next commit, which is harmless.
+    transaction.on_commit(partial(_refresh_pending, using), using=using)
+
+
+def _refresh_pending(using):
+    pending = _pending_days(using)
+    days = set(pending)
+    pending.clear()
+    if days:
+        refresh_days(days, using)
+
+
+def refresh_days(days, using=None):
+    """
+    Recompute all facts of the given days.
+
+    Args:
+        days: Iterable of dates
+        using: Database alias
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    with transaction.atomic(using=using):
+        _refresh_sales(days, using)
+        _refresh_expenses(days, using)
+        _refresh_products(days, using)
+
+
+def _replace_facts(model, days, facts, key_fields, using):
+    """
+    Store the recomputed facts of some days and delete the ones that are gone.
+
+    Args:
+        model: Fact model
+        days: Days that were recomputed
+        facts: Unsaved fact rows of those days
+        key_fields: Fields of the model's unique key, day first
+        using: Database alias
+    """
+    rows = model.objects.using(using)
+    if facts:
+        rows.bulk_create(
+            facts,
+            update_conflicts=True,
+            unique_fields=key_fields,
+            update_fields=[
+                field.name for field in model._meta.concrete_fields
+                if not field.primary_key and field.name not in key_fields
+            ],
+        )
+    attnames = [model._meta.get_field(name).attname for name in key_fields]
+    current = {tuple(getattr(fact, attname) for attname in attnames) for fact in facts}
+    stale = [
+        pk for pk, *key in rows.filter(day__in=days).values_list('pk', *attnames)
+        if tuple(key) not in current
+    ]
+    if stale:
+        rows.filter(pk__in=stale).delete()
+
+
+def _refresh_sales(days, using):
+    totals = (
+        Invoice.objects.using(using).filter(date_of_sale__in=days)
+        .values('date_of_sale')
+        .annotate(revenue=Sum('total'), amount_paid=Sum('amount_paid'), invoice_count=Count('id'))
+        .order_by()
+    )
+    facts = [
+        DailySalesFact(
+            day=row['date_of_sale'],
+            revenue=row['revenue'] or 0,
+            amount_paid=row['amount_paid'] or 0,
+            invoice_count=row['invoice_count'],
+        )
+        for row in totals
+    ]
+    _replace_facts(DailySalesFact, days, facts, ['day'], using)
+
+
+def _refresh_expenses(days, using):
+    totals = (
+        Expense.objects.using(using).filter(date__in=days)
+        .values('date', 'category')
+        .annotate(amount=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+    facts = [
+        DailyExpenseFact(
+            day=row['date'],
+            category_id=row['category'],
+            amount=row['amount'] or 0,
+            expense_count=row['expense_count'],
+        )
+        for row in totals
+    ]
+    _replace_facts(DailyExpenseFact, days, facts, ['day', 'category'], using)
+
+
+def _refresh_products(days, using):
+    totals = (
+        Sale.objects.using(using)
+        .filter(invoice__date_of_sale__in=days, product__isnull=False)
+        .values('invoice__date_of_sale', 'product')
+        .annotate(units=Sum('quantity'), revenue=Sum('total_price'))
+        .order_by()
+    )
+    facts = [
+        DailyProductFact(
+            day=row['invoice__date_of_sale'],
+            product_id=row['product'],
+            units=row['units'] or 0,
+            revenue=row['revenue'] or 0,
+        )
+        for row in totals
+    ]
+    _replace_facts(DailyProductFact, days, facts, ['day', 'product'], using)
+
+
+def recorded_days(using=None, since=None):
+    """
+    All days that have invoices or expenses.
+
+    Args:
+        using: Database alias
+        since: Only days on or after this date
+
+    Returns:
+        set: Dates
+    """
+    invoices = Invoice.objects.using(using).exclude(date_of_sale__isnull=True)
+    expenses = Expense.objects.using(using)
+    fact_tables = [
+        DailySalesFact.objects.using(using),
+        DailyExpenseFact.objects.using(using),
+        DailyProductFact.objects.using(using),
+    ]
+    if since:
+        invoices = invoices.filter(date_of_sale__gte=since)
+        expenses = expenses.filter(date__gte=since)
+        fact_tables = [facts.filter(day__gte=since) for facts in fact_tables]
+
+    days = set(invoices.values_list('date_of_sale', flat=True).distinct())
+    days |= set(expenses.values_list('date', flat=True).distinct())
+    # Days that only have (stale) facts left are included so they get cleared
+    for facts in fact_tables:
+        days |= set(facts.values_list('day', flat=True).distinct())
+    return days
+
+
+def sales_totals(start_date, end_date):
+    """
+    Revenue, amount paid and invoice count over a date range, from the facts.
+
+    Returns:
+        dict: total_revenue, paid_revenue (None when empty, like a raw
+        aggregate) and invoice_count
+    """
+    return DailySalesFact.objects.filter(day__range=[start_date, end_date]).aggregate(
+        total_revenue=Sum('revenue'),
+        paid_revenue=Sum('amount_paid'),
+        invoice_count=Coalesce(Sum('invoice_count'), Value(0)),
+    )
+
+
+def expense_totals_by_category(start_date, end_date):
+    """
+    Expense amount and count per category over a date range, from the facts.
+
+    Returns:
+        QuerySet: dicts with category__name, total and count, largest first
+    """
+    return (
+        DailyExpenseFact.objects.filter(day__range=[start_date, end_date])
+        .values('category__name')
+        .annotate(total=Sum('amount'), count=Sum('expense_count'))
+        .order_by('-total')
+    )
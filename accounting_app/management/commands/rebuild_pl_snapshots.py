@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounting_app.snapshots import rebuild_snapshots
+from tenants.models import Tenant
+from tenants.utils import ensure_tenant_database_loaded, switch_tenant_context
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly profit & loss snapshots from invoices and expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Rebuild a specific tenant only (by subdomain)'
+        )
+
+    def handle(self, *args, **options):
+        tenant_filter = options.get('tenant')
+
+        if tenant_filter:
+            tenants = Tenant.objects.filter(subdomain=tenant_filter)
+            if not tenants.exists():
+                raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
+        else:
+            tenants = Tenant.objects.filter(is_active=True)
+
+        for tenant in tenants:
+            try:
+                ensure_tenant_database_loaded(tenant)
+                alias = tenant.database_name
+                with switch_tenant_context(tenant), transaction.atomic(using=alias):
+                    months = rebuild_snapshots(using=alias)
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ {tenant.subdomain}: rebuilt {months} monthly snapshot(s)')
+                )
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Failed to rebuild snapshots for {tenant.subdomain}: {str(e)}')
+                )
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounting_app.facts import recorded_days, refresh_days
+from tenants.models import Tenant
+from tenants.utils import ensure_tenant_database_loaded, switch_tenant_context
+
+# Days recomputed per transaction (keeps IN lists and transactions small)
+BATCH_DAYS = 366
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily reporting facts from invoices, sale lines and expenses (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Reconcile a specific tenant only (by subdomain)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Number of most recent days to recompute'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute the whole history'
+        )
+
+    def handle(self, *args, **options):
+        tenant_filter = options.get('tenant')
+        since = None if options['all'] else timezone.now().date() - timedelta(days=max(0, options['days'] - 1))
+
+        if tenant_filter:
+            tenants = Tenant.objects.filter(subdomain=tenant_filter)
+            if not tenants.exists():
+                raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
+        else:
+            tenants = Tenant.objects.filter(is_active=True)
+
+        for tenant in tenants:
+            try:
+                ensure_tenant_database_loaded(tenant)
+                alias = tenant.database_name
+                with switch_tenant_context(tenant):
+                    days = sorted(recorded_days(alias, since=since))
+                    for start in range(0, len(days), BATCH_DAYS):
+                        refresh_days(days[start:start + BATCH_DAYS], using=alias)
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ {tenant.subdomain}: recomputed facts for {len(days)} day(s)')
+                )
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Failed to reconcile facts for {tenant.subdomain}: {str(e)}')
+                )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0002_expensecategory_taxsettings_accountingauditlog_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0003_expense_date_index'),
+        ('sales_app', '0017_pdfdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyExpenseFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_facts', to='accounting_app.expensecategory')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'category'), name='dailyexpensefact_day_category')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_facts', to='sales_app.product')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='dailyproductfact_day_product')],
+            },
+        ),
+    ]
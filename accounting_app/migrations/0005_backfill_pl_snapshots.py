@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:10
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+ZERO = Decimal('0')
+
+OUTSTANDING_PAYMENT_STATUSES = ['unpaid', 'partial', 'overdue']
+
+
+def rebuild_pl_snapshots(apps, schema_editor):
+    """
+    Compute every month's snapshot from the existing invoices and expenses.
+
+    Snapshots are maintained incrementally from here on (accounting_app/
+    signals.py); rows saved by the old dashboard only had revenue and
+    expenses, so all of them are replaced.
+    """
+    Invoice = apps.get_model('sales_app', 'Invoice')
+    Expense = apps.get_model('accounting_app', 'Expense')
+    ProfitLossSnapshot = apps.get_model('accounting_app', 'ProfitLossSnapshot')
+    db = schema_editor.connection.alias
+
+    invoices = (
+        Invoice.objects.using(db).exclude(date_of_sale__isnull=True)
+        .annotate(month=TruncMonth('date_of_sale')).values('month')
+        .annotate(
+            total_revenue=Coalesce(Sum('total'), Value(ZERO)),
+            total_invoices=Count('id'),
+            paid_invoices=Count('id', filter=Q(payment_status='paid')),
+            unpaid_amount=Coalesce(
+                Sum(
+                    Coalesce('total', Value(ZERO)) - Coalesce('amount_paid', Value(ZERO)),
+                    filter=Q(payment_status__in=OUTSTANDING_PAYMENT_STATUSES),
+                ),
+                Value(ZERO),
+            ),
+        )
+        .order_by('month')
+    )
+    expenses = (
+        Expense.objects.using(db).exclude(date__isnull=True)
+        .annotate(month=TruncMonth('date')).values('month')
+        .annotate(total_expenses=Coalesce(Sum('amount'), Value(ZERO)))
+        .order_by('month')
+    )
+
+    months = {}
+    for row in list(invoices) + list(expenses):
+        months.setdefault(row.pop('month'), {}).update(row)
+
+    ProfitLossSnapshot.objects.using(db).all().delete()
+    ProfitLossSnapshot.objects.using(db).bulk_create([
+        ProfitLossSnapshot(
+            month=month,
+            net_profit=values.get('total_revenue', ZERO) - values.get('total_expenses', ZERO),
+            **values,
+        )
+        for month, values in months.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0004_daily_facts'),
+        ('sales_app', '0019_catalogversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_pl_snapshots, migrations.RunPython.noop),
+    ]
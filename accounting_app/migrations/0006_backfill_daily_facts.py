@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:30
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_daily_facts(apps, schema_editor):
+    """Compute the daily facts of the existing invoices, sale lines and expenses"""
+    Invoice = apps.get_model('sales_app', 'Invoice')
+    Sale = apps.get_model('sales_app', 'Sale')
+    Expense = apps.get_model('accounting_app', 'Expense')
+    DailySalesFact = apps.get_model('accounting_app', 'DailySalesFact')
+    DailyExpenseFact = apps.get_model('accounting_app', 'DailyExpenseFact')
+    DailyProductFact = apps.get_model('accounting_app', 'DailyProductFact')
+    db = schema_editor.connection.alias
+
+    sales = (
+        Invoice.objects.using(db).exclude(date_of_sale__isnull=True)
+        .values('date_of_sale')
+        .annotate(revenue=Sum('total'), amount_paid=Sum('amount_paid'), invoice_count=Count('id'))
+        .order_by()
+    )
+    DailySalesFact.objects.using(db).all().delete()
+    DailySalesFact.objects.using(db).bulk_create([
+        DailySalesFact(
+            day=row['date_of_sale'],
+            revenue=row['revenue'] or 0,
+            amount_paid=row['amount_paid'] or 0,
+            invoice_count=row['invoice_count'],
+        )
+        for row in sales.iterator()
+    ], batch_size=500)
+
+    expenses = (
+        Expense.objects.using(db).exclude(date__isnull=True)
+        .values('date', 'category')
+        .annotate(amount=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+    DailyExpenseFact.objects.using(db).all().delete()
+    DailyExpenseFact.objects.using(db).bulk_create([
+        DailyExpenseFact(
+            day=row['date'],
+            category_id=row['category'],
+            amount=row['amount'] or 0,
+            expense_count=row['expense_count'],
+        )
+        for row in expenses.iterator()
+    ], batch_size=500)
+
+    products = (
+        Sale.objects.using(db)
+        .filter(invoice__date_of_sale__isnull=False, product__isnull=False)
+        .values('invoice__date_of_sale', 'product')
+        .annotate(units=Sum('quantity'), revenue=Sum('total_price'))
+        .order_by()
+    )
+    DailyProductFact.objects.using(db).all().delete()
+    DailyProductFact.objects.using(db).bulk_create([
+        DailyProductFact(
+            day=row['invoice__date_of_sale'],
+            product_id=row['product'],
+            units=row['units'] or 0,
+            revenue=row['revenue'] or 0,
+        )
+        for row in products.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting_app', '0005_backfill_pl_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_facts, migrations.RunPython.noop),
+    ]
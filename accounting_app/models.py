@@ -42,6 +42,9 @@ class Expense(models.Model):
     
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+        ]
     
     def __str__(self):
         return f"{self.category.name} - ${self.amount} on {self.date}"
@@ -121,4 +124,55 @@ class FinancialForecast(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.job_type} - {self.forecast_date}"
\ No newline at end of file
+        return f"{self.job_type} - {self.forecast_date}"
+
+
+class DailySalesFact(models.Model):
+    """Invoice totals per day (see facts.py)"""
+    day = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    invoice_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"Sales on {self.day}: {self.revenue}"
+
+
+class DailyExpenseFact(models.Model):
+    """Expense totals per day and category (see facts.py)"""
+    day = models.DateField()
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='daily_facts')
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='dailyexpensefact_day_category'),
+        ]
+    
+    def __str__(self):
+        return f"{self.category.name} on {self.day}: {self.amount}"
+
+
+class DailyProductFact(models.Model):
+    """Units sold per day and product, for sale lines linked to a product (see facts.py)"""
+    day = models.DateField()
+    product = models.ForeignKey('sales_app.Product', on_delete=models.CASCADE, related_name='daily_facts')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='dailyproductfact_day_product'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} on {self.day}: {self.units} units"
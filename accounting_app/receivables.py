@@ -0,0 +1,127 @@
+"""
+Accounts receivable figures, computed in the database.
+
+The revenue tracking page used to load every outstanding invoice and let the
+template filters (accounting_filters) walk the list three times to sum the
+balances and count the overdue and old invoices. The same figures now come
+from a single conditional aggregate (Sum/Count with filter=Q), so the page
+only loads the invoices it displays, one page at a time.
+
+An invoice is outstanding while its payment status is unpaid, partial or
+overdue; its balance is total - amount_paid, missing amounts counting as 0
+(as in Invoice.balance).
+
+The aging report puts each outstanding balance in a bucket by the age of the
+invoice (days since its date of sale): 0-30, 31-60, 61-90 and over 90 days.
+The buckets are conditional sums (Case/When) of one aggregate, grouped by
+customer in the database, so only one row per customer is read, however
+many invoices are open. Undated invoices count as current.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from sales_app.models import OUTSTANDING_PAYMENT_STATUSES, Invoice
+
+ZERO = Decimal('0')
+
+BALANCE = Coalesce('total', Value(ZERO)) - Coalesce('amount_paid', Value(ZERO))
+
+# (key, label, youngest age in days, oldest age in days or None)
+AGING_BUCKETS = (
+    ('days_0_30', '0-30 days', 0, 30),
+    ('days_31_60', '31-60 days', 31, 60),
+    ('days_61_90', '61-90 days', 61, 90),
+    ('days_over_90', '90+ days', 91, None),
+)
+
+
+def outstanding_invoices():
+    """Invoices whose payment is outstanding"""
+    return Invoice.objects.filter(payment_status__in=OUTSTANDING_PAYMENT_STATUSES)
+
+
+def receivables_summary(old_after_days=30):
+    """
+    Outstanding amount and invoice counts in one query.
+
+    Args:
+        old_after_days: Invoices dated this many days ago or earlier count as old
+
+    Returns:
+        dict: total_outstanding (sum of balances), invoice_count,
+        overdue_count (status 'overdue') and old_count
+    """
+    cutoff = timezone.now().date() - timedelta(days=old_after_days)
+    return outstanding_invoices().aggregate(
+        total_outstanding=Coalesce(Sum(BALANCE), Value(ZERO)),
+        invoice_count=Count('id'),
+        overdue_count=Count('id', filter=Q(payment_status='overdue')),
+        old_count=Count('id', filter=Q(date_of_sale__lte=cutoff)),
+    )
+
+
+def _bucket_condition(as_of, youngest, oldest):
+    """Invoices whose age on ``as_of`` is within a bucket"""
+    if oldest is None:
+        return Q(date_of_sale__lte=as_of - timedelta(days=youngest))
+    condition = Q(date_of_sale__gte=as_of - timedelta(days=oldest))
+    if youngest:
+        return condition & Q(date_of_sale__lte=as_of - timedelta(days=youngest))
+    # The current bucket also takes invoices dated later than as_of and undated ones
+    return condition | Q(date_of_sale__isnull=True)
+
+
+def aging_measures(as_of):
+    """Aggregates of the aging report: one conditional sum per bucket, the total and the count"""
+    measures = {
+        key: Coalesce(
+            Sum(Case(
+                When(_bucket_condition(as_of, youngest, oldest), then=BALANCE),
+                default=Value(ZERO),
+                output_field=DecimalField(),
+            )),
+            Value(ZERO),
+        )
+        for key, label, youngest, oldest in AGING_BUCKETS
+    }
+    measures['total'] = Coalesce(Sum(BALANCE), Value(ZERO))
+    measures['invoice_count'] = Count('id')
+    return measures
+
+
+def aging_by_customer(as_of=None):
+    """
+    Outstanding balances per customer and age bucket, in one grouped query.
+
+    Args:
+        as_of: Date the ages are counted from (defaults to today)
+
+    Returns:
+        QuerySet: dicts with customer ('' for invoices without a customer
+        name), the bucket keys of AGING_BUCKETS, total and invoice_count;
+        largest total first
+    """
+    as_of = as_of or timezone.now().date()
+    return (
+        outstanding_invoices()
+        .annotate(customer=Coalesce('customer_name', Value('')))
+        .values('customer')
+        .annotate(**aging_measures(as_of))
+        .order_by('-total', 'customer')
+    )
+
+
+def aging_totals(as_of=None):
+    """
+    Outstanding balances per age bucket over all customers.
+
+    Returns:
+        dict: The bucket keys of AGING_BUCKETS, total and invoice_count
+    """
+    as_of = as_of or timezone.now().date()
+    return outstanding_invoices().aggregate(**aging_measures(as_of))
@@ -0,0 +1,122 @@
+"""
+Time series for the accounting reports.
+
+Revenue, invoice counts and expenses are grouped by day, week or month in
+the database (TruncDay/TruncWeek/TruncMonth), one query per fact table
+whatever the length of the range, and periods without any rows are filled
+in with zeros here. They are read from the daily fact tables (facts.py), so
+a year is at most 366 rows per table. Periods are stepped on the calendar,
+so every month appears exactly once.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import DailyExpenseFact, DailySalesFact
+
+TRUNCATE = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def period_start(day, period):
+    """First day of the day/week/month containing a date (weeks start on Monday)"""
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def next_period(start, period):
+    """First day of the period following the one starting at ``start``"""
+    if period == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if period == 'week':
+        return start + timedelta(days=7)
+    return start + timedelta(days=1)
+
+
+def periods_back(day, count, period):
+    """First day of the period ``count`` periods before the one containing a date"""
+    start = period_start(day, period)
+    for _ in range(count):
+        start = period_start(start - timedelta(days=1), period)
+    return start
+
+
+def period_range(start_date, end_date, period):
+    """All period start dates from the period containing start_date to the one containing end_date"""
+    starts = []
+    current = period_start(start_date, period)
+    while current <= end_date:
+        starts.append(current)
+        current = next_period(current, period)
+    return starts
+
+
+def grouped_totals(queryset, date_field, start_date, end_date, period, **measures):
+    """
+    Aggregate a queryset per period in one query.
+
+    Args:
+        queryset: Rows to aggregate
+        date_field: Name of the DateField that places a row in a period
+        start_date, end_date: Inclusive date range
+        period: 'day', 'week' or 'month'
+        **measures: Aggregates to compute, e.g. revenue=Sum('total')
+
+    Returns:
+        dict: {period start date: {measure: value}} for periods with rows
+    """
+    rows = (
+        queryset.filter(**{f'{date_field}__range': [start_date, end_date]})
+        .annotate(period=TRUNCATE[period](date_field))
+        .values('period')
+        .annotate(**measures)
+        .order_by('period')
+    )
+    return {row.pop('period'): row for row in rows}
+
+
+def revenue_series(start_date, end_date, period='month'):
+    """
+    Revenue, invoice count and expenses per period, including empty periods.
+
+    Args:
+        start_date, end_date: Inclusive date range
+        period: 'day', 'week' or 'month'
+
+    Returns:
+        list: One dict per period, oldest first, with period_start,
+        period_end (both clipped to the range), revenue, invoice_count
+        and expenses
+    """
+    if period not in TRUNCATE:
+        raise ValueError(f'Unknown period "{period}"; use one of {", ".join(TRUNCATE)}')
+
+    invoices = grouped_totals(
+        DailySalesFact.objects.all(), 'day', start_date, end_date, period,
+        revenue=Sum('revenue'), invoice_count=Sum('invoice_count'),
+    )
+    expenses = grouped_totals(
+        DailyExpenseFact.objects.all(), 'day', start_date, end_date, period,
+        expenses=Sum('amount'),
+    )
+
+    series = []
+    for start in period_range(start_date, end_date, period):
+        invoice_totals = invoices.get(start, {})
+        series.append({
+            'period_start': max(start, start_date),
+            'period_end': min(next_period(start, period) - timedelta(days=1), end_date),
+            'revenue': invoice_totals.get('revenue') or Decimal('0'),
+            'invoice_count': invoice_totals.get('invoice_count') or 0,
+            'expenses': expenses.get(start, {}).get('expenses') or Decimal('0'),
+        })
+    return series
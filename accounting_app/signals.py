@@ -0,0 +1,91 @@
+"""
+Signal handlers that keep the monthly ProfitLossSnapshot rollups
+(snapshots.py) and the daily fact tables (facts.py) in sync with invoices,
+sale lines and expenses.
+
+Sale lines have no handlers of their own: the views save the invoice after
+its formset, which marks the day once per invoice instead of once per line,
+and send sale_lines_changed when they change lines alone.
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from sales_app.models import Invoice
+from sales_app.signals import sale_lines_changed
+
+from .facts import mark_days_dirty
+from .models import Expense
+from .snapshots import (
+    EXPENSE_FIELDS, INVOICE_FIELDS, apply_change, expense_contribution, invoice_contribution,
+    loaded_values,
+)
+
+CONTRIBUTIONS = {
+    Invoice: (INVOICE_FIELDS, invoice_contribution),
+    Expense: (EXPENSE_FIELDS, expense_contribution),
+}
+
+
+def _contribution(instance, values=None):
+    fields, contribution = CONTRIBUTIONS[type(instance)]
+    return contribution(values if values is not None else loaded_values(instance, fields))
+
+
+@receiver(post_init, sender=Invoice)
+@receiver(post_init, sender=Expense)
+def remember_contribution(sender, instance, **kwargs):
+    """Remember the row's contribution as loaded, to compute deltas on save"""
+    instance._pl_values = loaded_values(instance, CONTRIBUTIONS[sender][0])
+
+
+def _load_deferred_values(sender, instance, using):
+    """Read the stored values when some were deferred at load time"""
+    if instance._pl_values is None:
+        fields = CONTRIBUTIONS[sender][0]
+        instance._pl_values = sender._base_manager.using(using).filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_save, sender=Expense)
+def load_values_before_save(sender, instance, raw, using, **kwargs):
+    """Make sure the stored contribution is known before it changes"""
+    if not raw and not instance._state.adding:
+        _load_deferred_values(sender, instance, using)
+
+
+@receiver(pre_delete, sender=Invoice)
+@receiver(pre_delete, sender=Expense)
+def load_values_before_delete(sender, instance, using, **kwargs):
+    """Make sure the stored contribution is known before the row goes away"""
+    _load_deferred_values(sender, instance, using)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Expense)
+def update_rollups_on_save(sender, instance, created, raw, using, **kwargs):
+    """Move the row's snapshot contribution and mark its old and new day dirty"""
+    if raw:
+        return
+    fields = CONTRIBUTIONS[sender][0]
+    old_values = {} if created else (instance._pl_values or {})
+    new_values = {field: getattr(instance, field) for field in fields}
+    apply_change(_contribution(instance, old_values), _contribution(instance, new_values), using=using)
+    instance._pl_values = new_values
+
+    mark_days_dirty({old_values.get(fields[0]), new_values[fields[0]]}, using)
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Expense)
+def update_rollups_on_delete(sender, instance, using, **kwargs):
+    """Remove the deleted row's snapshot contribution and mark its day dirty"""
+    old_values = instance._pl_values or {}
+    apply_change(_contribution(instance, old_values), None, using=using)
+    mark_days_dirty({old_values.get(CONTRIBUTIONS[sender][0][0])}, using)
+
+
+@receiver(sale_lines_changed)
+def invoice_lines_changed(sender, invoice, using, **kwargs):
+    """Recompute the daily product facts of an invoice whose lines changed on their own"""
+    mark_days_dirty([invoice.date_of_sale], using)
@@ -0,0 +1,196 @@
+"""
+Monthly profit & loss rollups (ProfitLossSnapshot), maintained incrementally.
+
+Every invoice and expense contributes to the snapshot of the month it is
+dated in. Saving or deleting one applies the difference between its old and
+new contribution with a single UPDATE ... SET col = col + delta (see
+signals.py), inside the same transaction as the change itself, so the
+dashboard only ever reads a row.
+
+Contribution of an invoice: its total to total_revenue, 1 to total_invoices,
+1 to paid_invoices when paid, and total - amount_paid to unpaid_amount while
+payment is outstanding. Contribution of an expense: its amount to
+total_expenses. net_profit moves with both.
+
+Migration 0005 computes the snapshots of the data that existed before.
+Changes that bypass model signals (queryset.update(), raw SQL) are not seen;
+``manage.py rebuild_pl_snapshots`` recomputes every month from scratch.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from sales_app.models import OUTSTANDING_PAYMENT_STATUSES, Invoice
+
+from .facts import as_date
+from .models import Expense, ProfitLossSnapshot
+
+ZERO = Decimal('0')
+
+INVOICE_FIELDS = ('date_of_sale', 'total', 'amount_paid', 'payment_status')
+EXPENSE_FIELDS = ('date', 'amount')
+
+MEASURES = ('total_revenue', 'total_expenses', 'total_invoices', 'paid_invoices', 'unpaid_amount')
+
+
+def loaded_values(instance, fields):
+    """
+    Values of the given fields as loaded, or None if any of them is deferred.
+    """
+    values = {}
+    for field in fields:
+        if field not in instance.__dict__:
+            return None
+        values[field] = instance.__dict__[field]
+    return values
+
+
+def month_of(day):
+    """First day of the month of a date (or of an unsaved default datetime)"""
+    return as_date(day).replace(day=1)
+
+
+def invoice_contribution(values):
+    """
+    Snapshot contribution of an invoice.
+
+    Args:
+        values: dict with date_of_sale, total, amount_paid and payment_status
+
+    Returns:
+        tuple: (month, {measure: amount}), or None for undated invoices
+    """
+    if not values or not values['date_of_sale']:
+        return None
+    total = values['total'] or ZERO
+    outstanding = values['payment_status'] in OUTSTANDING_PAYMENT_STATUSES
+    return month_of(values['date_of_sale']), {
+        'total_revenue': total,
+        'total_invoices': 1,
+        'paid_invoices': 1 if values['payment_status'] == 'paid' else 0,
+        'unpaid_amount': total - (values['amount_paid'] or ZERO) if outstanding else ZERO,
+    }
+
+
+def expense_contribution(values):
+    """
+    Snapshot contribution of an expense.
+
+    Args:
+        values: dict with date and amount
+
+    Returns:
+        tuple: (month, {measure: amount}), or None without a date
+    """
+    if not values or not values['date']:
+        return None
+    return month_of(values['date']), {'total_expenses': values['amount'] or ZERO}
+
+
+def apply_change(old, new, using=None):
+    """
+    Move a row's contribution from its old to its new state.
+
+    Args:
+        old: Contribution before the change (None if the row is new)
+        new: Contribution after the change (None if the row was deleted)
+        using: Database alias
+    """
+    deltas = {}
+    for contribution, sign in ((old, -1), (new, 1)):
+        if contribution is None:
+            continue
+        month, amounts = contribution
+        month_deltas = deltas.setdefault(month, {})
+        for measure, amount in amounts.items():
+            month_deltas[measure] = month_deltas.get(measure, 0) + sign * amount
+
+    for month, month_deltas in deltas.items():
+        month_deltas = {measure: amount for measure, amount in month_deltas.items() if amount}
+        if month_deltas:
+            _apply_deltas(month, month_deltas, using)
+
+
+def _apply_deltas(month, deltas, using):
+    """Add deltas to a month's snapshot with one UPDATE (creating the row if needed)"""
+    snapshots = ProfitLossSnapshot.objects.using(using)
+    updates = {measure: F(measure) + amount for measure, amount in deltas.items()}
+    net_change = deltas.get('total_revenue', ZERO) - deltas.get('total_expenses', ZERO)
+    if net_change:
+        updates['net_profit'] = F('net_profit') + net_change
+    updates['updated_at'] = timezone.now()
+    if not snapshots.filter(month=month).update(**updates):
+        snapshots.get_or_create(month=month)
+        snapshots.filter(month=month).update(**updates)
+
+
+def compute_snapshots(using=None):
+    """
+    Compute every month's snapshot values from the invoices and expenses.
+
+    Returns:
+        dict: {month: {measure: value}} for months with invoices or expenses
+    """
+    invoices = (
+        Invoice.objects.using(using).exclude(date_of_sale__isnull=True)
+        .annotate(month=TruncMonth('date_of_sale')).values('month')
+        .annotate(
+            total_revenue=Coalesce(Sum('total'), Value(ZERO)),
+            total_invoices=Count('id'),
+            paid_invoices=Count('id', filter=Q(payment_status='paid')),
+            unpaid_amount=Coalesce(
+                Sum(
+                    Coalesce('total', Value(ZERO)) - Coalesce('amount_paid', Value(ZERO)),
+                    filter=Q(payment_status__in=OUTSTANDING_PAYMENT_STATUSES),
+                ),
+                Value(ZERO),
+            ),
+        )
+        .order_by('month')
+    )
+    expenses = (
+        Expense.objects.using(using).exclude(date__isnull=True)
+        .annotate(month=TruncMonth('date')).values('month')
+        .annotate(total_expenses=Coalesce(Sum('amount'), Value(ZERO)))
+        .order_by('month')
+    )
+
+    months = {}
+    for row in list(invoices) + list(expenses):
+        values = months.setdefault(row.pop('month'), dict.fromkeys(MEASURES, 0))
+        values.update(row)
+    for values in months.values():
+        values['net_profit'] = values['total_revenue'] - values['total_expenses']
+    return months
+
+
+def rebuild_snapshots(using=None):
+    """
+    Recompute all snapshots; months without any invoices or expenses are removed.
+
+    Returns:
+        int: Number of months written
+    """
+    months = compute_snapshots(using)
+    snapshots = ProfitLossSnapshot.objects.using(using)
+    snapshots.exclude(month__in=list(months)).delete()
+    existing = {snapshot.month: snapshot for snapshot in snapshots.filter(month__in=list(months))}
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for month, values in months.items():
+        snapshot = existing.get(month)
+        if snapshot is None:
+            to_create.append(ProfitLossSnapshot(month=month, **values))
+            continue
+        for field, value in values.items():
+            setattr(snapshot, field, value)
+        snapshot.updated_at = now
+        to_update.append(snapshot)
+
+    snapshots.bulk_create(to_create)
+    snapshots.bulk_update(to_update, [*MEASURES, 'net_profit', 'updated_at'])
+    return len(months)
@@ -1,3 +1,284 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.urls import reverse
+
+from sales_app.models import Invoice, Product, Sale
+from tenants.testing import TenantTestCase
+
+from .facts import refresh_days
+from .receivables import aging_by_customer, aging_totals, receivables_summary
+from .models import (
+    DailyExpenseFact, DailyProductFact, DailySalesFact, Expense, ExpenseCategory, ProfitLossSnapshot,
+)
+
+
+class DailyFactTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.login('Managers')
+        self.today = date.today()
+        self.pen = Product.objects.create(name='Pen', price=Decimal('2.00'), stock=100)
+
+    def create_invoice(self, quantities, day=None):
+        """Invoice with one line per quantity, saved like the sales entry view does"""
+        invoice = Invoice.objects.create(customer_name='Bob', date_of_sale=day or self.today)
+        for quantity in quantities:
+            Sale.objects.create(
+                invoice=invoice, item='Pen', product=self.pen, quantity=quantity,
+                unit_price=Decimal('2.00'), total_price=Decimal('2.00') * quantity,
+            )
+        invoice.total = sum(item.total_price for item in invoice.items.all())
+        invoice.save()
+        return invoice
+
+    def test_sale_lines_do_not_query_the_facts(self):
+        invoice = Invoice.objects.create(customer_name='Bob', date_of_sale=self.today)
+
+        with CaptureQueriesContext(connection) as queries:
+            for quantity in (1, 2, 3):
+                Sale.objects.create(invoice=invoice, item='Pen', product=self.pen, quantity=quantity)
+
+        self.assertEqual(len(queries), 3)
+
+    def test_facts_are_refreshed_once_the_invoice_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_invoice([1, 2, 3])
+
+        sales = DailySalesFact.objects.get(day=self.today)
+        self.assertEqual((sales.revenue, sales.invoice_count), (Decimal('12.00'), 1))
+        self.assertEqual(DailyProductFact.objects.get(day=self.today, product=self.pen).units, 6)
+
+    def test_edit_sale_refreshes_the_product_facts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = self.create_invoice([1]).items.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('edit_sale', args=[sale.pk]), {
+                'item': self.pen.pk, 'unit_price': '2.00', 'quantity': '4', 'discount': '0', 'total_price': '8.00',
+            })
+
+        self.assertEqual(DailyProductFact.objects.get(day=self.today, product=self.pen).units, 4)
+
+    def test_refresh_updates_existing_rows_and_deletes_stale_ones(self):
+        category = ExpenseCategory.objects.create(name='Rent')
+        other = ExpenseCategory.objects.create(name='Power')
+        yesterday = self.today - timedelta(days=1)
+        self.create_invoice([2])
+        expense = Expense.objects.create(
+            amount=Decimal('50.00'), date=self.today, category=category, description='Rent', created_by=self.user,
+        )
+        # Rows left by an earlier refresh, or written by a concurrent one
+        DailySalesFact.objects.create(day=self.today, revenue=Decimal('1.00'), invoice_count=9)
+        DailyExpenseFact.objects.create(day=self.today, category=other, amount=Decimal('5.00'), expense_count=1)
+        DailySalesFact.objects.create(day=yesterday, revenue=Decimal('3.00'), invoice_count=1)
+
+        refresh_days([self.today, yesterday])
+        refresh_days([self.today, yesterday])
+
+        sales = DailySalesFact.objects.get(day=self.today)
+        self.assertEqual((sales.revenue, sales.invoice_count), (Decimal('4.00'), 1))
+        self.assertFalse(DailySalesFact.objects.filter(day=yesterday).exists())
+        self.assertEqual(
+            list(DailyExpenseFact.objects.values_list('category', 'amount')), [(category.pk, Decimal('50.00'))],
+        )
+
+        expense.delete()
+        refresh_days([self.today])
+        self.assertFalse(DailyExpenseFact.objects.exists())
+
+    def test_migration_backfills_existing_data(self):
+        invoice, = Invoice.objects.bulk_create([
+            Invoice(invoice_no='INV-1', date_of_sale=self.today, total=Decimal('6.00'), payment_status='unpaid'),
+        ])
+        Sale.objects.bulk_create([
+            Sale(invoice=invoice, item='Pen', product=self.pen, quantity=quantity, total_price=Decimal('2.00') * quantity)
+            for quantity in (1, 2)
+        ])
+        migration = import_module('accounting_app.migrations.0006_backfill_daily_facts')
+
+        migration.backfill_daily_facts(apps, SimpleNamespace(connection=connection))
+
+        sales = DailySalesFact.objects.get(day=self.today)
+        self.assertEqual((sales.revenue, sales.invoice_count), (Decimal('6.00'), 1))
+        self.assertEqual(DailyProductFact.objects.get(day=self.today, product=self.pen).units, 3)
+
+    def test_linking_old_sales_refreshes_their_product_facts(self):
+        invoice, = Invoice.objects.bulk_create([
+            Invoice(invoice_no='INV-1', date_of_sale=self.today, total=Decimal('6.00'), payment_status='unpaid'),
+        ])
+        # Saved before sale lines were linked to products
+        Sale.objects.bulk_create([Sale(invoice=invoice, item='Pen', quantity=3, total_price=Decimal('6.00'))])
+        refresh_days([self.today])
+        self.assertFalse(DailyProductFact.objects.exists())
+
+        call_command('backfill_sale_products', tenant=self.subdomain, stdout=StringIO())
+
+        self.assertEqual(DailyProductFact.objects.get(day=self.today, product=self.pen).units, 3)
+
+
+class ProfitLossSnapshotTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.login('Managers')
+        self.month = date.today().replace(day=1)
+        self.category = ExpenseCategory.objects.create(name='Rent')
+
+    def snapshot(self, month=None):
+        return ProfitLossSnapshot.objects.values(
+            'total_revenue', 'total_expenses', 'net_profit', 'total_invoices', 'paid_invoices', 'unpaid_amount',
+        ).get(month=month or self.month)
+
+    def test_invoice_changes_move_their_contribution(self):
+        invoice = Invoice.objects.create(date_of_sale=self.month, total=Decimal('10.00'))
+        self.assertEqual(self.snapshot(), {
+            'total_revenue': Decimal('10.00'), 'total_expenses': Decimal('0.00'), 'net_profit': Decimal('10.00'),
+            'total_invoices': 1, 'paid_invoices': 0, 'unpaid_amount': Decimal('10.00'),
+        })
+
+        invoice.amount_paid = Decimal('10.00')
+        invoice.save()
+        self.assertEqual(
+            (self.snapshot()['paid_invoices'], self.snapshot()['unpaid_amount']), (1, Decimal('0.00')),
+        )
+
+        last_month = (self.month - timedelta(days=1)).replace(day=1)
+        invoice.date_of_sale = last_month
+        invoice.save()
+        self.assertEqual(self.snapshot()['total_invoices'], 0)
+        self.assertEqual(self.snapshot(last_month)['total_revenue'], Decimal('10.00'))
+
+        Invoice.objects.get(pk=invoice.pk).delete()
+        self.assertEqual(self.snapshot(last_month)['total_revenue'], Decimal('0.00'))
+
+    def test_expenses_lower_the_net_profit(self):
+        Invoice.objects.create(date_of_sale=self.month, total=Decimal('10.00'))
+        expense = Expense.objects.create(
+            amount=Decimal('4.00'), date=self.month, category=self.category, description='Rent', created_by=self.user,
+        )
+        self.assertEqual(self.snapshot()['net_profit'], Decimal('6.00'))
+
+        expense.delete()
+        self.assertEqual(self.snapshot()['net_profit'], Decimal('10.00'))
+
+    def test_migration_backfills_existing_data(self):
+        # Rows written before the signals existed, and a stale snapshot of the old dashboard
+        Invoice.objects.bulk_create([
+            Invoice(invoice_no='INV-1', date_of_sale=self.month, total=Decimal('10.00'), payment_status='unpaid'),
+            Invoice(
+                invoice_no='INV-2', date_of_sale=self.month, total=Decimal('5.00'),
+                amount_paid=Decimal('5.00'), payment_status='paid',
+            ),
+        ])
+        Expense.objects.bulk_create([Expense(
+            amount=Decimal('3.00'), date=self.month, category=self.category, description='Rent', created_by=self.user,
+        )])
+        ProfitLossSnapshot.objects.create(month=self.month, total_revenue=Decimal('99.00'))
+        migration = import_module('accounting_app.migrations.0005_backfill_pl_snapshots')
+
+        migration.rebuild_pl_snapshots(apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(self.snapshot(), {
+            'total_revenue': Decimal('15.00'), 'total_expenses': Decimal('3.00'), 'net_profit': Decimal('12.00'),
+            'total_invoices': 2, 'paid_invoices': 1, 'unpaid_amount': Decimal('10.00'),
+        })
+
+
+def create_invoices(*specs):
+    """Invoices from (customer, days old or None, total, amount paid, payment status); bypasses Invoice.save()"""
+    today = date.today()
+    return Invoice.objects.bulk_create([
+        Invoice(
+            invoice_no=f'INV-{index}',
+            customer_name=customer,
+            date_of_sale=None if age is None else today - timedelta(days=age),
+            total=Decimal(total),
+            amount_paid=Decimal(paid),
+            payment_status=status,
+        )
+        for index, (customer, age, total, paid, status) in enumerate(specs)
+    ])
+
+
+class ReceivablesTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login('Admin')
+        create_invoices(
+            ('Ann', 40, '10.00', '0', 'unpaid'),
+            ('Ann', 5, '20.00', '5.00', 'partial'),
+            ('Bob', 2, '7.00', '0', 'overdue'),
+            ('Bob', 1, '50.00', '50.00', 'paid'),
+            ('Cid', 1, '9.00', '0', 'cancelled'),
+        )
+
+    def test_summary_counts_outstanding_invoices_only(self):
+        self.assertEqual(receivables_summary(old_after_days=30), {
+            'total_outstanding': Decimal('32.00'),
+            'invoice_count': 3,
+            'overdue_count': 1,
+            'old_count': 1,
+        })
+
+    @override_settings(ACCOUNTING_OUTSTANDING_PAGE_SIZE=2)
+    def test_revenue_page_lists_outstanding_invoices_one_page_at_a_time(self):
+        response = self.client.get(reverse('revenue_tracking'), {'page': 2})
+
+        self.assertEqual(response.status_code, 200)
+        page = response.context['outstanding_page']
+        self.assertEqual((page.number, page.paginator.count), (2, 3))
+        self.assertEqual([invoice.invoice_no for invoice in page.object_list], ['INV-0'])
+        self.assertEqual(response.context['receivables']['total_outstanding'], Decimal('32.00'))
+
+
+class AgingReportTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login('Admin')
+        create_invoices(
+            ('Ann', -3, '1.00', '0', 'unpaid'),  # Dated after as_of: current
+            ('Ann', 30, '2.00', '0', 'unpaid'),
+            ('Ann', 31, '4.00', '0', 'unpaid'),
+            ('Bob', 60, '8.00', '0', 'overdue'),
+            ('Bob', 61, '16.00', '0', 'overdue'),
+            ('Bob', 90, '32.00', '2.00', 'partial'),
+            (None, 91, '64.00', '0', 'unpaid'),
+            ('Bob', None, '128.00', '0', 'unpaid'),  # Undated: current
+            ('Ann', 100, '256.00', '256.00', 'paid'),
+        )
+
+    def test_balances_fall_in_buckets_by_age(self):
+        self.assertEqual(aging_totals(), {
+            'days_0_30': Decimal('131.00'),
+            'days_31_60': Decimal('12.00'),
+            'days_61_90': Decimal('46.00'),
+            'days_over_90': Decimal('64.00'),
+            'total': Decimal('253.00'),
+            'invoice_count': 8,
+        })
+
+    def test_customers_are_grouped_largest_total_first(self):
+        rows = list(aging_by_customer())
+
+        self.assertEqual([row['customer'] for row in rows], ['Bob', '', 'Ann'])
+        self.assertEqual(
+            [rows[0][key] for key in ('days_0_30', 'days_31_60', 'days_61_90', 'days_over_90')],
+            [Decimal('128.00'), Decimal('8.00'), Decimal('46.00'), Decimal('0.00')],
+        )
+        self.assertEqual((rows[2]['total'], rows[2]['invoice_count']), (Decimal('7.00'), 3))
+
+    def test_csv_export_streams_customers_and_totals(self):
+        response = self.client.get(reverse('ar_aging_report'), {'format': 'csv'})
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Customer,0-30 days,31-60 days,61-90 days,90+ days,Total,Invoices')
+        self.assertEqual(lines[2], 'No customer name,0.00,0.00,0.00,64.00,64.00,1')
+        self.assertEqual(lines[-1], 'Total,131.00,12.00,46.00,64.00,253.00,8')
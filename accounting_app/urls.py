@@ -15,6 +15,7 @@ urlpatterns = [
     # Reports
     path('reports/profit-loss/', views.profit_loss_report, name='profit_loss_report'),
     path('reports/revenue/', views.revenue_tracking, name='revenue_tracking'),
+    path('reports/ar-aging/', views.ar_aging_report, name='ar_aging_report'),
     
     # Legacy routes for compatibility
     path('forecast_dashboard/', views.forecast_dashboard, name='forecast_dashboard'),
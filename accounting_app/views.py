@@ -1,23 +1,34 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db import transaction
+from django.db import router, transaction
 from django.db.models import Sum, Q, Count
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from django.utils import timezone
 from django.core.paginator import Paginator
 from datetime import datetime, timedelta
 from decimal import Decimal
+import csv
 import json
+from itertools import islice
 from calendar import monthrange
 
+from .facts import expense_totals_by_category, sales_totals
+from .receivables import (
+    AGING_BUCKETS, aging_by_customer, aging_totals, outstanding_invoices, receivables_summary
+)
+from .reports import periods_back, revenue_series
 from .models import (
     FinancialForecast, Expense, ExpenseCategory, ProfitLossSnapshot,
     TaxSettings, AccountingAuditLog
 )
 from sales_app.models import Invoice, Sale
 from tenants.decorators import tenant_required
+from tenants.middleware import get_current_tenant
+from tenants.utils import switch_tenant_context
 
 def is_admin(user):
     return user.is_authenticated and user.groups.filter(name='Admin').exists()
@@ -60,31 +71,13 @@ def accounting_dashboard(request):
     today = timezone.now().date()
     current_month = today.replace(day=1)
     
-    # Revenue metrics
-    monthly_revenue = Invoice.objects.filter(
-        date_of_sale__year=today.year,
-        date_of_sale__month=today.month
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    # Expense metrics
-    monthly_expenses = Expense.objects.filter(
-        date__year=today.year,
-        date__month=today.month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Month totals come from the incrementally maintained snapshot (read only)
+    snapshot = ProfitLossSnapshot.objects.filter(month=current_month).first()
+    monthly_revenue = snapshot.total_revenue if snapshot else Decimal('0')
+    monthly_expenses = snapshot.total_expenses if snapshot else Decimal('0')
     
     # Outstanding payments
-    outstanding_invoices = Invoice.objects.filter(
-        payment_status__in=['unpaid', 'partial', 'overdue']
-    ).aggregate(
-        count=Count('id'),
-        total=Sum('total'),
-        paid=Sum('amount_paid')
-    )
-    
-    # Calculate outstanding amount properly handling None values
-    total_invoice_amount = outstanding_invoices['total'] or 0
-    total_paid_amount = outstanding_invoices['paid'] or 0
-    outstanding_amount = total_invoice_amount - total_paid_amount
+    receivables = receivables_summary()
     
     # Recent expenses
     recent_expenses = Expense.objects.select_related('category').order_by('-created_at')[:5]
@@ -93,30 +86,13 @@ def accounting_dashboard(request):
     net_profit = monthly_revenue - monthly_expenses
     profit_margin = (net_profit / monthly_revenue * 100) if monthly_revenue > 0 else 0
     
-    # Get or create monthly snapshot
-    snapshot, created = ProfitLossSnapshot.objects.get_or_create(
-        month=current_month,
-        defaults={
-            'total_revenue': monthly_revenue,
-            'total_expenses': monthly_expenses,
-            'net_profit': net_profit
-        }
-    )
-    
-    if not created:
-        # Update existing snapshot
-        snapshot.total_revenue = monthly_revenue
-        snapshot.total_expenses = monthly_expenses
-        snapshot.net_profit = net_profit
-        snapshot.save()
-    
     context = {
         'monthly_revenue': monthly_revenue,
         'monthly_expenses': monthly_expenses,
         'net_profit': net_profit,
         'profit_margin': profit_margin,
-        'outstanding_amount': outstanding_amount,
-        'outstanding_count': outstanding_invoices['count'] or 0,
+        'outstanding_amount': receivables['total_outstanding'],
+        'outstanding_count': receivables['invoice_count'],
         'recent_expenses': recent_expenses,
         'current_month': current_month.strftime('%B %Y'),
     }
@@ -178,7 +154,7 @@ def expense_create(request):
     """Create new expense"""
     if request.method == 'POST':
         try:
-            with transaction.atomic():
+            with transaction.atomic(using=router.db_for_write(Expense)):
                 # Get or create category
                 category_name = request.POST.get('category_name', '').strip()
                 category_id = request.POST.get('category')
@@ -226,7 +202,7 @@ def expense_edit(request, expense_id):
     
     if request.method == 'POST':
         try:
-            with transaction.atomic():
+            with transaction.atomic(using=router.db_for_write(Expense)):
                 old_amount = expense.amount
                 
                 expense.amount = Decimal(request.POST['amount'])
@@ -293,22 +269,9 @@ def profit_loss_report(request):
         end_date = datetime(year, 12, 31).date()
         period_title = f"Year {year}"
     
-    # Calculate revenue
-    revenue_data = Invoice.objects.filter(
-        date_of_sale__range=[start_date, end_date]
-    ).aggregate(
-        total_revenue=Sum('total'),
-        paid_revenue=Sum('amount_paid'),
-        invoice_count=Count('id')
-    )
-    
-    # Calculate expenses by category
-    expense_data = Expense.objects.filter(
-        date__range=[start_date, end_date]
-    ).values('category__name').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total')
+    # Revenue and expenses by category, from the daily fact tables
+    revenue_data = sales_totals(start_date, end_date)
+    expense_data = expense_totals_by_category(start_date, end_date)
     
     total_expenses = sum(item['total'] for item in expense_data)
     total_revenue = revenue_data['total_revenue'] or 0
@@ -353,33 +316,29 @@ def profit_loss_report(request):
 @user_passes_test(is_admin)
 def revenue_tracking(request):
     """Revenue tracking and analysis"""
-    # Get monthly revenue for the last 12 months
+    # Monthly revenue for the last 12 months, current month included
     end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=365)
-    
-    monthly_data = []
-    for i in range(12):
-        month_start = (start_date.replace(day=1) + timedelta(days=32*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        if month_end > end_date:
-            month_end = end_date
-        
-        revenue = Invoice.objects.filter(
-            date_of_sale__range=[month_start, month_end]
-        ).aggregate(total=Sum('total'))['total'] or Decimal('0')
-        
-        monthly_data.append({
-            'month': month_start.strftime('%B %Y'),
-            'revenue': float(revenue),  # Convert to float for JavaScript
-            'month_start': month_start,
-            'month_end': month_end
-        })
-    
-    # Outstanding invoices analysis
-    outstanding_invoices = Invoice.objects.filter(
-        payment_status__in=['unpaid', 'partial', 'overdue']
-    ).select_related('user').order_by('-date_of_sale')
+    start_date = periods_back(end_date, 11, 'month')
+    
+    monthly_data = [
+        {
+            'month': month['period_start'].strftime('%B %Y'),
+            'revenue': float(month['revenue']),  # Convert to float for JavaScript
+            'expenses': float(month['expenses']),
+            'invoice_count': month['invoice_count'],
+            'month_start': month['period_start'],
+            'month_end': month['period_end'],
+        }
+        for month in revenue_series(start_date, end_date, 'month')
+    ]
+    
+    # Outstanding invoices analysis: totals in one query, the list one page at a time
+    receivables = receivables_summary(old_after_days=30)
+    paginator = Paginator(
+        outstanding_invoices().select_related('user').order_by('-date_of_sale', '-id'),
+        getattr(settings, 'ACCOUNTING_OUTSTANDING_PAGE_SIZE', 50),
+    )
+    outstanding_page = paginator.get_page(request.GET.get('page'))
     
     # Payment status breakdown
     status_breakdown = Invoice.objects.values('payment_status').annotate(
@@ -393,12 +352,85 @@ def revenue_tracking(request):
     context = {
         'monthly_data': monthly_data,
         'total_12_month_revenue': total_12_month_revenue,
-        'outstanding_invoices': outstanding_invoices,
+        'receivables': receivables,
+        'outstanding_page': outstanding_page,
         'status_breakdown': status_breakdown,
     }
     
     return render(request, 'accounting_app/revenue_tracking.html', context)
 
+class _Echo:
+    """File-like object that hands each written CSV line back to the writer's caller"""
+    def write(self, value):
+        return value
+
+AGING_CSV_CHUNK_SIZE = 2000
+
+def _csv_amount(value):
+    # Conditional sums come back without their scale on some backends (0 vs 0.00)
+    return f'{value:.2f}'
+
+def _aging_csv_rows(tenant, rows, totals):
+    """CSV lines of the aging report, customers first and the totals last"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['Customer', *(label for key, label, *_ in AGING_BUCKETS), 'Total', 'Invoices'])
+    # The response is consumed after the tenant middleware has reset the
+    # context, so switch to the tenant around each chunk (as in sales_app.printing)
+    rows = rows.iterator(chunk_size=AGING_CSV_CHUNK_SIZE)
+    while True:
+        with switch_tenant_context(tenant):
+            chunk = list(islice(rows, AGING_CSV_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield ''.join(
+            writer.writerow([
+                row['customer'] or 'No customer name',
+                *(_csv_amount(row[key]) for key, *_ in AGING_BUCKETS),
+                _csv_amount(row['total']),
+                row['invoice_count'],
+            ])
+            for row in chunk
+        )
+    yield writer.writerow([
+        'Total',
+        *(_csv_amount(totals[key]) for key, *_ in AGING_BUCKETS),
+        _csv_amount(totals['total']),
+        totals['invoice_count'],
+    ])
+
+@login_required
+@user_passes_test(is_admin)
+def ar_aging_report(request):
+    """Accounts receivable aging per customer, as a page or CSV (?format=csv)"""
+    as_of = parse_date(request.GET.get('as_of') or '') or timezone.now().date()
+    rows = aging_by_customer(as_of)
+    totals = aging_totals(as_of)
+    
+    if request.GET.get('format') == 'csv':
+        # Streamed in chunks so the size of the export does not matter
+        response = StreamingHttpResponse(
+            _aging_csv_rows(get_current_tenant(), rows, totals),
+            content_type='text/csv',
+        )
+        response['Content-Disposition'] = f'attachment; filename="ar-aging-{as_of.isoformat()}.csv"'
+        log_audit_action(request.user, 'export', 'ARAgingReport', details=f'Exported AR aging as of {as_of}')
+        return response
+    
+    paginator = Paginator(rows, getattr(settings, 'ACCOUNTING_OUTSTANDING_PAGE_SIZE', 50))
+    page = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'as_of': as_of,
+        'buckets': [{'label': label, 'total': totals[key]} for key, label, *_ in AGING_BUCKETS],
+        'customers': [
+            {**row, 'amounts': [row[key] for key, *_ in AGING_BUCKETS]}
+            for row in page.object_list
+        ],
+        'page_obj': page,
+        'totals': totals,
+    }
+    return render(request, 'accounting_app/ar_aging_report.html', context)
+
 # Legacy forecast dashboard for compatibility
 def forecast_dashboard(request):
     return redirect('accounting_dashboard')
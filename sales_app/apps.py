@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SalesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sales_app'
+
+    def ready(self):
+        # Register signal handlers that bump the product catalog version and
+        # queue cached PDFs again
+        from . import signals  # noqa: F401
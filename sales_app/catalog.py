@@ -0,0 +1,79 @@
+"""
+Per-tenant product catalog version and cached product search results.
+
+Every Product write (saves, deletes and the stock engine's bulk UPDATEs)
+bumps the version of the tenant's catalog once the transaction commits. The
+product API uses it as an ETag, so unchanged results are answered with 304,
+and as part of the cache key of search results, so a write makes every
+cached result of that tenant stale at once without deleting keys.
+
+The version is a counter row in the tenant's database (CatalogVersion), so
+every process sees a write as soon as it commits, whatever cache backend
+holds the search results.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import CatalogVersion, Product
+
+
+def _catalog_alias(using=None):
+    return using or router.db_for_read(Product)
+
+
+def get_catalog_version(using=None):
+    """
+    Get the catalog version of a tenant database.
+
+    Args:
+        using: Database alias (defaults to the current tenant's database)
+
+    Returns:
+        int: Version number
+    """
+    return CatalogVersion.current(_catalog_alias(using))
+
+
+def bump_catalog_version(using=None):
+    """
+    Publish a new catalog version after the current transaction commits.
+
+    The counter is updated after the commit, in a transaction of its own,
+    so its row is not locked for the whole of a sale.
+
+    Args:
+        using: Database alias (defaults to the current tenant's database)
+    """
+    alias = router.db_for_write(Product) if using is None else using
+    transaction.on_commit(lambda: CatalogVersion.bump(alias), using=alias)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag of product API responses, for use with @condition(etag_func=...)"""
+    return f'{get_catalog_version()}-{hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]}'
+
+
+def get_cached_search_results(endpoint, query, build):
+    """
+    Get product search results from the cache, building them on a miss.
+
+    Args:
+        endpoint: Name of the API endpoint (responses differ per endpoint)
+        query: Search term
+        build: Callable taking the query and returning JSON-serializable data
+
+    Returns:
+        The cached or freshly built data
+    """
+    alias = _catalog_alias()
+    digest = hashlib.md5(query.encode()).hexdigest()
+    key = f'catalog:search:{alias}:{get_catalog_version(alias)}:{endpoint}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = build(query)
+        cache.set(key, data, getattr(settings, 'PRODUCT_SEARCH_CACHE_TTL', 300))
+    return data
@@ -1,5 +1,6 @@
 # sales_app/forms.py
 from django import forms
+from django.forms import BaseInlineFormSet
 from .models import Invoice, Sale, Product
 
 class ProductForm(forms.ModelForm):
@@ -26,18 +27,91 @@ class InvoiceForm(forms.ModelForm):
         }
 
 
+class RemoteSelect(forms.Select):
+    """
+    Select whose options are loaded over AJAX by Select2.
+
+    Only the empty option and the selected value are rendered, so a form
+    never iterates the whole product catalogue. The field supplies labels
+    through ``label_for_value``.
+    """
+
+    empty_label = ''
+
+    def label_for_value(self, value):
+        return None
+
+    def optgroups(self, name, value, attrs=None):
+        options = [('', self.empty_label or '')]
+        for selected in value:
+            if selected not in ('', None):
+                label = self.label_for_value(selected)
+                if label is not None:
+                    options.append((selected, label))
+
+        groups = []
+        for index, (option_value, label) in enumerate(options):
+            selected = option_value != '' or len(options) == 1
+            groups.append((None, [self.create_option(name, option_value, label, selected, index, attrs=attrs)], index))
+        return groups
+
+
+class ProductChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField for products picked with the Select2 AJAX search.
+
+    Submitted ids are resolved from ``products`` ({str(pk): Product or None}),
+    which BaseSaleFormSet fills with one query for the whole formset; ids
+    missing from it fall back to a single lookup.
+    """
+    widget = RemoteSelect
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.products = {}
+        self._bind_widget()
+
+    def __deepcopy__(self, memo):
+        result = super().__deepcopy__(memo)
+        result.products = {}
+        result._bind_widget()
+        return result
+
+    def _bind_widget(self):
+        self.widget.empty_label = self.empty_label
+        self.widget.label_for_value = self.label_for_value
+
+    def get_product(self, value):
+        """Get the product for a submitted id, or None if it does not exist"""
+        key = str(value)
+        if key not in self.products:
+            try:
+                self.products[key] = self.queryset.get(pk=value)
+            except (ValueError, TypeError, self.queryset.model.DoesNotExist):
+                return None
+        return self.products[key]
+
+    def label_for_value(self, value):
+        product = self.get_product(value)
+        return self.label_from_instance(product) if product is not None else None
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        product = self.get_product(value)
+        if product is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return product
+
+
 class SaleForm(forms.ModelForm):
-    # --- Override the 'item' field here ---
-    # Define it as a ModelChoiceField directly in the form class, not in Meta.widgets
-    item = forms.ModelChoiceField(
+    # Products are searched with Select2 (/sales/api/products/), so only the
+    # selected product is rendered instead of the whole catalogue
+    item = ProductChoiceField(
         queryset=Product.objects.all().order_by('name'),
         empty_label="enter item...",
         required=False,
-        # You can optionally specify the widget and its attributes here if needed,
-        # although widget_tweaks in the template usually handles styling.
-        # widget=forms.Select(attrs={'class': 'form-control'}) 
     )
-    # --- End of field override ---
 
     class Meta:
         model = Sale
@@ -58,27 +132,77 @@ class SaleForm(forms.ModelForm):
         for saving into the Sale.item CharField.
         """
         data = self.cleaned_data['item']
+        # Keep the Product itself for the stock engine and the Sale.product link
+        self.cleaned_data['product'] = data
+        self.instance.product = data
         # data is either a Product instance or None
         if data:
             return data.name # Return the name of the product
         return data # Return None if no product was selected
 
     # --- Add the __init__ method ---
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, products=None, initial_products=None, **kwargs):
         super().__init__(*args, **kwargs)
+        # Share the formset's batched {str(pk): Product} lookup
+        if products is not None:
+            self.fields['item'].products = products
         # If this form is for editing an existing Sale instance
-        if self.instance and self.instance.pk and self.instance.item:
-            try:
+        if self.instance and self.instance.pk and self.instance.product_id:
+            product = self.instance.product
+            self.initial['item'] = product
+            self.fields['item'].products.setdefault(str(product.pk), product)
+        elif self.instance and self.instance.pk and self.instance.item:
+            # Rows saved before Sale.product existed are matched by name
+            if initial_products is not None:
+                # Resolved for the whole formset by BaseSaleFormSet
+                product = initial_products.get(self.instance.item)
+            else:
                 # Try to find the Product object whose name matches the Sale.item string
-                product = Product.objects.get(name=self.instance.item)
-                # Set the initial value of the 'item' field to this Product instance
+                product = Product.objects.filter(name=self.instance.item).order_by('pk').first()
+            # If the name in Sale.item doesn't match any current Product,
+            # the field will just be blank/empty_label, which is fine.
+            if product is not None:
                 self.initial['item'] = product
-            except Product.DoesNotExist:
-                # If the name in Sale.item doesn't match any current Product,
-                # the field will just be blank/empty_label, which is fine.
-                pass
-        # Ensure the 'item' field has the correct classes applied via widget_tweaks
-        # The widget_tweaks filter in the template handles the 'form-control' class.
-        # If you needed to set it here, you could do:
-        # if 'item' in self.fields:
-        #     self.fields['item'].widget.attrs.update({'class': 'form-control'})
+                self.fields['item'].products.setdefault(str(product.pk), product)
+
+
+class BaseSaleFormSet(BaseInlineFormSet):
+    """
+    Inline formset for Sale rows that resolves every submitted product id,
+    and the products of the saved line items (joined, or matched by name for
+    rows without a product link), with one query each and shares the results
+    with all of its forms.
+    """
+
+    def __init__(self, *args, queryset=None, **kwargs):
+        if queryset is None:
+            queryset = self.model._default_manager.select_related('product')
+        super().__init__(*args, queryset=queryset, **kwargs)
+        self.products = {}
+        if self.is_bound:
+            ids = set()
+            for i in range(self.total_form_count()):
+                value = self.data.get(self.add_prefix(i) + '-item')
+                if value and str(value).isdigit():
+                    ids.add(int(value))
+            if ids:
+                queryset = self.form.base_fields['item'].queryset
+                found = queryset.in_bulk(ids)
+                # Unknown ids are cached as None so they are not looked up again
+                self.products = {str(pk): found.get(pk) for pk in ids}
+
+        # Products of saved line items without a product link, by name, for
+        # the forms' initial values
+        self.initial_products = {}
+        if self.instance.pk:
+            names = {sale.item for sale in self.get_queryset() if sale.item and not sale.product_id}
+            if names:
+                queryset = self.form.base_fields['item'].queryset
+                for product in queryset.filter(name__in=names).order_by('pk'):
+                    self.initial_products.setdefault(product.name, product)
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs['products'] = self.products
+        kwargs['initial_products'] = self.initial_products
+        return kwargs
@@ -0,0 +1,109 @@
+"""
+Indexed invoice search for the manager dashboard and its print view.
+
+The dashboard ORs together a date range, a customer name and an invoice
+number (any criterion may match). ``icontains`` on the text fields cannot use
+a B-tree index, so the whole OR used to scan the Invoice table. Each
+criterion is now answered by an index and the OR combines their hits:
+
+- Date range: the (date_of_sale, id) index.
+- PostgreSQL text: GIN trigram indexes (pg_trgm) on UPPER(customer_name)
+  and UPPER(invoice_no), matching the SQL Django generates for icontains.
+- SQLite text: FTS5 trigram table over both columns, kept in sync with
+  the invoice table by triggers on insert, update and delete (see
+  migration 0015); matches come back as a rowid subquery.
+"""
+
+import threading
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SQLITE_FTS_TABLE = 'sales_app_invoice_fts'
+
+# The trigram tokenizer can only use its index for patterns of 3+ characters
+MIN_TRIGRAM_LENGTH = 3
+
+_fts_aliases = set()
+_fts_lock = threading.Lock()
+
+
+def _has_fts_table(using):
+    """Check (once per alias, remembering only hits) for the SQLite FTS table"""
+    with _fts_lock:
+        if using in _fts_aliases:
+            return True
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        found = SQLITE_FTS_TABLE in connection.introspection.table_names()
+    except DatabaseError:
+        return False
+    if found:
+        with _fts_lock:
+            _fts_aliases.add(using)
+    return found
+
+
+def text_match(field, term, using):
+    """
+    Build the condition for a case-insensitive substring match on a text field.
+
+    Args:
+        field: 'customer_name' or 'invoice_no'
+        term: Text to look for
+        using: Database alias the query will run on
+
+    Returns:
+        Q: Condition using the FTS table on SQLite when possible, otherwise
+        icontains (served by the trigram index on PostgreSQL)
+    """
+    if (
+        len(term) >= MIN_TRIGRAM_LENGTH and '%' not in term and '_' not in term
+        and _has_fts_table(using)
+    ):
+        return Q(pk__in=RawSQL(
+            f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {field} LIKE %s',
+            [f'%{term}%'],
+        ))
+    return Q(**{f'{field}__icontains': term})
+
+
+def date_range(start_date=None, end_date=None):
+    """Condition for invoices sold within a (possibly open) date range"""
+    conditions = {}
+    if start_date:
+        conditions['date_of_sale__gte'] = start_date
+    if end_date:
+        conditions['date_of_sale__lte'] = end_date
+    return Q(**conditions) if conditions else None
+
+
+def search_invoices(queryset, start_date=None, end_date=None, customer_name='', invoice_no=''):
+    """
+    Filter invoices matching any of the given criteria.
+
+    Args:
+        queryset: Invoice queryset to filter
+        start_date, end_date: Date range (either end may be open)
+        customer_name: Substring of the customer name
+        invoice_no: Substring of the invoice number
+
+    Returns:
+        QuerySet: Invoices matching at least one criterion, or the queryset
+        unchanged if no criterion is given
+    """
+    using = queryset.db
+    conditions = [date_range(start_date, end_date)]
+    if customer_name:
+        conditions.append(text_match('customer_name', customer_name, using))
+    if invoice_no:
+        conditions.append(text_match('invoice_no', invoice_no, using))
+
+    combined = None
+    for condition in conditions:
+        if condition is not None:
+            combined = condition if combined is None else combined | condition
+    return queryset if combined is None else queryset.filter(combined)
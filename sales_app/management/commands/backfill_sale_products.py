@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounting_app.facts import refresh_days
+from sales_app.models import Sale
+from sales_app.stock import resolve_product_names
+from tenants.models import Tenant
+from tenants.utils import ensure_tenant_database_loaded, switch_tenant_context
+
+
+class Command(BaseCommand):
+    help = 'Link existing sales to products (Sale.product) by product name, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Backfill a specific tenant only (by subdomain)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of sales resolved and updated per transaction'
+        )
+
+    def handle(self, *args, **options):
+        tenant_filter = options.get('tenant')
+        batch_size = max(1, options['batch_size'])
+        self.verbosity = options['verbosity']
+
+        if tenant_filter:
+            tenants = Tenant.objects.filter(subdomain=tenant_filter)
+            if not tenants.exists():
+                raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
+        else:
+            tenants = Tenant.objects.filter(is_active=True)
+
+        for tenant in tenants:
+            try:
+                ensure_tenant_database_loaded(tenant)
+                with switch_tenant_context(tenant):
+                    linked, unmatched = self._backfill(tenant.database_name, batch_size)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✅ {tenant.subdomain}: linked {linked} sale(s), '
+                        f'{unmatched} without a matching product'
+                    )
+                )
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Failed to backfill {tenant.subdomain}: {str(e)}')
+                )
+
+    def _backfill(self, alias, batch_size):
+        """
+        Walk unlinked sales in primary key order, one batch per transaction.
+
+        bulk_update sends no signals, so the daily product facts of the days
+        whose sales were linked are recomputed in the same transaction.
+        """
+        linked = unmatched = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Sale.objects.filter(pk__gt=last_pk, product__isnull=True)
+                .exclude(item__isnull=True).exclude(item='')
+                .select_related('invoice').order_by('pk')
+                .only('pk', 'item', 'invoice', 'invoice__date_of_sale')[:batch_size]
+            )
+            if not batch:
+                return linked, unmatched
+            last_pk = batch[-1].pk
+
+            with transaction.atomic(using=alias):
+                product_ids = resolve_product_names({sale.item for sale in batch})
+                updates = []
+                for sale in batch:
+                    sale.product_id = product_ids.get(sale.item)
+                    if sale.product_id is None:
+                        unmatched += 1
+                    else:
+                        updates.append(sale)
+                Sale.objects.bulk_update(updates, ['product'], batch_size=batch_size)
+                refresh_days(
+                    {sale.invoice.date_of_sale for sale in updates if sale.invoice and sale.invoice.date_of_sale},
+                    using=alias,
+                )
+            linked += len(updates)
+
+            if self.verbosity > 1:
+                self.stdout.write(f'   {alias}: up to sale #{last_pk}, {linked} linked')
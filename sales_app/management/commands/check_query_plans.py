@@ -0,0 +1,172 @@
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from accounting_app.models import Expense, ExpenseCategory
+from accounting_app.receivables import aging_by_customer
+from sales_app.invoice_search import search_invoices
+from sales_app.models import OUTSTANDING_PAYMENT_STATUSES, Invoice, Product, Sale
+from tenants.models import Tenant
+from tenants.utils import ensure_tenant_database_loaded, switch_tenant_context
+
+
+# SQLite: "<id> <parent> <notused> SCAN table" without an index;
+# PostgreSQL: "Seq Scan on table"
+SQLITE_SCAN = re.compile(r'^(?:\d+ \d+ \d+ )?SCAN (?!.*\bUSING\b)(?!.*VIRTUAL TABLE)')
+POSTGRES_SCAN = re.compile(r'\bSeq Scan on\b')
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the queries behind the dashboards and reports against a generated '
+        'dataset and flag sequential scans (the dataset is rolled back afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Check a specific tenant database only (by subdomain)'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20000,
+            help='Number of invoices to generate (0 = use existing data only)'
+        )
+
+    def handle(self, *args, **options):
+        tenant_filter = options.get('tenant')
+
+        if tenant_filter:
+            tenants = Tenant.objects.filter(subdomain=tenant_filter)
+            if not tenants.exists():
+                raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
+        else:
+            tenants = Tenant.objects.filter(is_active=True)
+
+        flagged = 0
+        for tenant in tenants:
+            ensure_tenant_database_loaded(tenant)
+            alias = tenant.database_name
+            self.stdout.write(f'Checking query plans for {tenant.subdomain}...')
+            with switch_tenant_context(tenant), transaction.atomic(using=alias):
+                if options['rows']:
+                    self._generate_dataset(options['rows'])
+                with connections[alias].cursor() as cursor:
+                    # Fresh statistics, otherwise planners assume tiny tables
+                    cursor.execute('ANALYZE')
+                flagged += self._check_queries(alias)
+                transaction.set_rollback(True, using=alias)
+
+        if flagged:
+            raise CommandError(f'{flagged} quer{"y uses" if flagged == 1 else "ies use"} a sequential scan')
+        self.stdout.write(self.style.SUCCESS('All checked queries use indexes.'))
+
+    def hot_queries(self):
+        """(label, queryset) pairs mirroring the filters of the hot views"""
+        today = timezone.now().date()
+        month_start = today.replace(day=1)
+        year_start = today.replace(month=1, day=1)
+        return [
+            ('manager_dashboard: today',
+             Invoice.objects.filter(date_of_sale=today).order_by('-date_of_sale', '-id')[:51]),
+            ('manager_dashboard: date range',
+             search_invoices(Invoice.objects.all(), month_start, today).order_by('-date_of_sale', '-id')[:51]),
+            ('manager_dashboard: customer name',
+             search_invoices(Invoice.objects.all(), customer_name='Customer 12').values('id')),
+            ('manager_dashboard: invoice number',
+             search_invoices(Invoice.objects.all(), invoice_no='CHK-0001').values('id')),
+            ('print_daily_invoices',
+             Invoice.objects.filter(date_of_sale=today).order_by('invoice_no')),
+            ('accounting_dashboard: month revenue',
+             Invoice.objects.filter(date_of_sale__range=[month_start, today]).values('total')),
+            ('accounting_dashboard: outstanding',
+             Invoice.objects.filter(payment_status__in=OUTSTANDING_PAYMENT_STATUSES).values('total', 'amount_paid')),
+            ('accounting_dashboard: month expenses',
+             Expense.objects.filter(date__range=[month_start, today]).values('amount')),
+            ('revenue_tracking: outstanding list',
+             Invoice.objects.filter(payment_status__in=OUTSTANDING_PAYMENT_STATUSES)
+             .select_related('user').order_by('-date_of_sale')[:50]),
+            ('revenue_tracking: status breakdown',
+             Invoice.objects.values('payment_status').annotate(count=Count('id'), total=Sum('total')).order_by()),
+            ('ar_aging_report: per customer',
+             aging_by_customer(today)),
+            ('profit_loss_report: revenue',
+             Invoice.objects.filter(date_of_sale__range=[year_start, today]).values('total', 'amount_paid')),
+            ('profit_loss_report: expenses',
+             Expense.objects.filter(date__range=[year_start, today]).values('category__name', 'amount')),
+            ('sales by item',
+             Sale.objects.filter(item='Product 7').values('quantity')),
+        ]
+
+    def _check_queries(self, alias):
+        flagged = 0
+        for label, queryset in self.hot_queries():
+            plan = queryset.using(alias).explain()
+            scans = [line.strip() for line in plan.splitlines() if self._is_sequential_scan(line)]
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.ERROR(f'❌ {label}'))
+                for line in scans:
+                    self.stdout.write(f'      {line}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {label}'))
+        return flagged
+
+    @staticmethod
+    def _is_sequential_scan(line):
+        line = line.strip(' -|`')
+        return bool(SQLITE_SCAN.match(line) or POSTGRES_SCAN.search(line))
+
+    def _generate_dataset(self, rows):
+        """Create invoices over two years, with sale lines and expenses"""
+        random.seed(0)
+        today = timezone.now().date()
+        user = User.objects.create(username=f'query-plan-check-{random.randint(0, 10**9)}')
+        products = Product.objects.bulk_create(
+            [Product(name=f'Product {i}', price=Decimal('10.00'), stock=1000) for i in range(200)]
+        )
+        # Most of a two-year history is settled
+        statuses = ['paid'] * 57 + OUTSTANDING_PAYMENT_STATUSES
+
+        invoices = Invoice.objects.bulk_create([
+            Invoice(
+                invoice_no=f'CHK-{i:07d}',
+                customer_name=f'Customer {random.randint(1, rows // 10 + 1)}',
+                date_of_sale=today - timedelta(days=random.randint(0, 730)),
+                total=Decimal('20.00'),
+                amount_paid=Decimal('20.00'),
+                payment_status=random.choice(statuses),
+                user=user,
+            )
+            for i in range(rows)
+        ], batch_size=2000)
+
+        Sale.objects.bulk_create([
+            Sale(invoice=invoice, item=product.name, product=product, quantity=1,
+                 unit_price=Decimal('10.00'), total_price=Decimal('10.00'))
+            for invoice in invoices
+            for product in random.sample(products, 2)
+        ], batch_size=2000)
+
+        categories = [
+            ExpenseCategory.objects.get_or_create(name=f'Query plan check {i}')[0] for i in range(5)
+        ]
+        Expense.objects.bulk_create([
+            Expense(
+                date=today - timedelta(days=random.randint(0, 730)),
+                category=random.choice(categories),
+                description='Generated for check_query_plans',
+                amount=Decimal('5.00'),
+                created_by=user,
+            )
+            for _ in range(rows // 5)
+        ], batch_size=2000)
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales_app import pdf
+from tenants.models import Tenant
+from tenants.utils import ensure_tenant_database_loaded, switch_tenant_context
+
+
+class Command(BaseCommand):
+    help = 'Render queued receipt and daily report PDFs (run as a long-lived worker process)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Process a specific tenant only (by subdomain)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queues are empty instead of polling'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queues are empty'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=3,
+            help='Attempts before a document is marked as failed'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=300,
+            help='Seconds after which a running document is considered abandoned'
+        )
+
+    def handle(self, *args, **options):
+        if pdf.weasyprint is None:
+            raise CommandError('Rendering PDFs requires WeasyPrint (pip install weasyprint)')
+
+        tenant_filter = options.get('tenant')
+        if tenant_filter and not Tenant.objects.filter(subdomain=tenant_filter).exists():
+            raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
+
+        while True:
+            # Re-read the tenant list each round so new tenants are picked up
+            if tenant_filter:
+                tenants = Tenant.objects.filter(subdomain=tenant_filter)
+            else:
+                tenants = Tenant.objects.filter(is_active=True)
+
+            processed = 0
+            for tenant in tenants:
+                try:
+                    ensure_tenant_database_loaded(tenant)
+                    with switch_tenant_context(tenant):
+                        processed += self._drain(tenant, options)
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(f'❌ Failed to process PDFs for {tenant.subdomain}: {str(e)}')
+                    )
+
+            if options['once'] and not processed:
+                return
+            if not processed:
+                time.sleep(options['interval'])
+
+    def _drain(self, tenant, options):
+        """Render the tenant's queued documents until its queue is empty"""
+        processed = 0
+        while True:
+            document = pdf.claim_next_document(timeout=options['timeout'])
+            if document is None:
+                return processed
+            processed += 1
+            subject = document.invoice.invoice_no if document.kind == 'receipt' else document.report_date
+            label = f'{tenant.subdomain}: {document.get_kind_display()} {subject}'
+            if pdf.render_document(document, max_attempts=options['max_attempts']):
+                self.stdout.write(self.style.SUCCESS(f'✅ {label}'))
+            elif document.attempts >= options['max_attempts']:
+                self.stdout.write(self.style.ERROR(f'❌ {label}: gave up after {document.attempts} attempts'))
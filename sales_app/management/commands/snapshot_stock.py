@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales_app.stock import take_stock_snapshots
+from tenants.models import Tenant
+from tenants.utils import ensure_tenant_database_loaded, switch_tenant_context
+
+
+class Command(BaseCommand):
+    help = 'Snapshot current product stock levels (run periodically, e.g. nightly)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Snapshot a specific tenant only (by subdomain)'
+        )
+    
+    def handle(self, *args, **options):
+        tenant_filter = options.get('tenant')
+        
+        if tenant_filter:
+            tenants = Tenant.objects.filter(subdomain=tenant_filter)
+            if not tenants.exists():
+                raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
+        else:
+            tenants = Tenant.objects.filter(is_active=True)
+        
+        for tenant in tenants:
+            try:
+                ensure_tenant_database_loaded(tenant)
+                # Batches are committed one by one so product locks stay short
+                with switch_tenant_context(tenant):
+                    created = take_stock_snapshots(using=tenant.database_name)
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ {tenant.subdomain}: {created} product snapshot(s)')
+                )
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'❌ Failed to snapshot {tenant.subdomain}: {str(e)}')
+                )
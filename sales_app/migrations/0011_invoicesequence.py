@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:19
+
+import re
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_invoice_sequences(apps, schema_editor):
+    """Start each day's counter after the highest existing invoice number"""
+    Invoice = apps.get_model('sales_app', 'Invoice')
+    InvoiceSequence = apps.get_model('sales_app', 'InvoiceSequence')
+    db = schema_editor.connection.alias
+    pattern = re.compile(r'^INV-(\d{8})-(\d+)$')
+
+    last_numbers = {}
+    invoice_numbers = (
+        Invoice.objects.using(db)
+        .filter(invoice_no__startswith='INV-')
+        .values_list('invoice_no', flat=True)
+    )
+    for invoice_no in invoice_numbers.iterator():
+        match = pattern.match(invoice_no or '')
+        if match:
+            day, number = match.group(1), int(match.group(2))
+            last_numbers[day] = max(number, last_numbers.get(day, 0))
+
+    InvoiceSequence.objects.using(db).bulk_create([
+        InvoiceSequence(date=datetime.strptime(day, '%Y%m%d').date(), last_number=number)
+        for day, number in last_numbers.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0010_invoice_due_date_invoice_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_invoice_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:10
+
+import django.db.models.functions.text
+from django.db import DatabaseError, migrations, models
+
+FTS_TABLE = 'sales_app_product_fts'
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, content='sales_app_product', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON sales_app_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON sales_app_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name ON sales_app_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRESQL_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Matches the UPPER("name"::text) LIKE UPPER(...) SQL of istartswith/icontains
+    "CREATE INDEX IF NOT EXISTS sales_app_product_name_trgm "
+    "ON sales_app_product USING gin (UPPER(name::text) gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS sales_app_product_name_trgm",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_CREATE:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        try:
+            for statement in SQLITE_CREATE:
+                schema_editor.execute(statement)
+        except DatabaseError:
+            # SQLite built without FTS5 or older than 3.34 (no trigram
+            # tokenizer): product search falls back to plain lookups
+            for statement in SQLITE_DROP:
+                schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_DROP:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0012_stock_ledger_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='product_name_lower_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0013_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales', to='sales_app.product'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:31
+
+from django.conf import settings
+from django.db import DatabaseError, migrations, models
+
+FTS_TABLE = 'sales_app_invoice_fts'
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"customer_name, invoice_no, content='sales_app_invoice', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON sales_app_invoice BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, customer_name, invoice_no) "
+    f"VALUES (new.id, new.customer_name, new.invoice_no); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON sales_app_invoice BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, customer_name, invoice_no) "
+    f"VALUES ('delete', old.id, old.customer_name, old.invoice_no); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF customer_name, invoice_no "
+    f"ON sales_app_invoice BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, customer_name, invoice_no) "
+    f"VALUES ('delete', old.id, old.customer_name, old.invoice_no); "
+    f"INSERT INTO {FTS_TABLE}(rowid, customer_name, invoice_no) "
+    f"VALUES (new.id, new.customer_name, new.invoice_no); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRESQL_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Match the UPPER("column"::text) LIKE UPPER(...) SQL of icontains
+    "CREATE INDEX IF NOT EXISTS sales_app_invoice_customer_trgm "
+    "ON sales_app_invoice USING gin (UPPER(customer_name::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS sales_app_invoice_no_trgm "
+    "ON sales_app_invoice USING gin (UPPER(invoice_no::text) gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS sales_app_invoice_customer_trgm",
+    "DROP INDEX IF EXISTS sales_app_invoice_no_trgm",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_CREATE:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        try:
+            for statement in SQLITE_CREATE:
+                schema_editor.execute(statement)
+        except DatabaseError:
+            # No FTS5 trigram support: invoice search falls back to icontains
+            for statement in SQLITE_DROP:
+                schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_DROP:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0014_sale_product'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['date_of_sale', 'id'], name='invoice_date_id_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0015_invoice_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['payment_status', 'date_of_sale', 'total', 'amount_paid'], name='invoice_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['customer_name'], name='invoice_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('payment_status__in', ['unpaid', 'partial', 'overdue'])), fields=['date_of_sale'], name='invoice_outstanding_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['item'], name='sale_item_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0016_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('daily_report', 'Daily Report')], max_length=20)),
+                ('report_date', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('generation', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('file_path', models.CharField(blank=True, max_length=255)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('rendered_at', models.DateTimeField(blank=True, null=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pdf_documents', to='sales_app.invoice')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='pdfdoc_status_requested_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('kind', 'receipt')), fields=('invoice',), name='pdfdoc_unique_receipt'), models.UniqueConstraint(condition=models.Q(('kind', 'daily_report')), fields=('report_date',), name='pdfdoc_unique_daily_report')],
+            },
+        ),
+    ]
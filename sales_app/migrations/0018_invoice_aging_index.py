@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0017_pdfdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('payment_status__in', ['unpaid', 'partial', 'overdue'])), fields=['customer_name', 'date_of_sale', 'total', 'amount_paid'], name='invoice_outstanding_cust_idx'),
+        ),
+    ]
@@ -1,7 +1,81 @@
-from django.db import models
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+
+class InvoiceSequence(models.Model):
+    """
+    Per-day counter used to number invoices (INV-YYYYMMDD-NNN).
+    
+    Each tenant database has its own table, so numbering is per tenant.
+    The counter row is incremented with a single UPDATE, which locks it until
+    the surrounding transaction ends, so concurrent sales never get the same
+    number and no scan of existing invoice numbers is needed.
+    """
+    date = models.DateField(unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.date}: {self.last_number}"
+    
+    @classmethod
+    def next_number(cls, date, using=None):
+        """Atomically increment and return the counter for the given date"""
+        using = using or router.db_for_write(cls)
+        counters = cls.objects.using(using).filter(date=date)
+        
+        with transaction.atomic(using=using):
+            if not counters.update(last_number=F('last_number') + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        cls.objects.using(using).create(date=date, last_number=1)
+                    return 1
+                except IntegrityError:
+                    # Another sale created today's counter first
+                    counters.update(last_number=F('last_number') + 1)
+            return counters.values_list('last_number', flat=True).get()
+
+
+class CatalogVersion(models.Model):
+    """
+    Version counter of the tenant's product catalog (see catalog.py).
+    
+    A single row in each tenant database, so every process serving the
+    tenant reads the same version.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return str(self.version)
+    
+    @classmethod
+    def current(cls, using=None):
+        """Get the catalog version, 0 until the catalog is first changed"""
+        using = using or router.db_for_read(cls)
+        return cls.objects.using(using).filter(pk=1).values_list('version', flat=True).first() or 0
+    
+    @classmethod
+    def bump(cls, using=None):
+        """Atomically increment the catalog version"""
+        using = using or router.db_for_write(cls)
+        versions = cls.objects.using(using).filter(pk=1)
+        
+        with transaction.atomic(using=using):
+            if not versions.update(version=F('version') + 1):
+                try:
+                    with transaction.atomic(using=using):
+                        cls.objects.using(using).create(pk=1, version=1)
+                except IntegrityError:
+                    # Another process created the row first
+                    versions.update(version=F('version') + 1)
+
+
+# Invoice payment statuses that still have money owed on them
+OUTSTANDING_PAYMENT_STATUSES = ['unpaid', 'partial', 'overdue']
+
+
 class Invoice(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('paid', 'Paid'),
@@ -22,6 +96,32 @@ class Invoice(models.Model):
     payment_status = models.CharField(max_length=10, choices=PAYMENT_STATUS_CHOICES, default='unpaid')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoices')
 
+    class Meta:
+        indexes = [
+            # Keyset pagination and date-range search (see pagination.py, invoice_search.py)
+            models.Index(fields=['date_of_sale', 'id'], name='invoice_date_id_idx'),
+            # Payment status breakdowns and outstanding totals; covers the summed
+            # amounts so they are read from the index alone
+            models.Index(
+                fields=['payment_status', 'date_of_sale', 'total', 'amount_paid'],
+                name='invoice_status_date_idx',
+            ),
+            models.Index(fields=['customer_name'], name='invoice_customer_idx'),
+            # Outstanding invoices only (partial index on PostgreSQL and SQLite)
+            models.Index(
+                fields=['date_of_sale'],
+                condition=models.Q(payment_status__in=OUTSTANDING_PAYMENT_STATUSES),
+                name='invoice_outstanding_date_idx',
+            ),
+            # AR aging per customer: the balances of outstanding invoices are
+            # read from the index alone (see accounting_app/receivables.py)
+            models.Index(
+                fields=['customer_name', 'date_of_sale', 'total', 'amount_paid'],
+                condition=models.Q(payment_status__in=OUTSTANDING_PAYMENT_STATUSES),
+                name='invoice_outstanding_cust_idx',
+            ),
+        ]
+
     @property
     def balance(self):
         """Calculate the remaining balance (total - amount_paid)"""
@@ -42,15 +142,11 @@ class Invoice(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.invoice_no:
-            today = timezone.now().strftime('%Y%m%d')
-            prefix = f"INV-{today}-"
-            last_invoice = Invoice.objects.filter(invoice_no__startswith=prefix).order_by('-invoice_no').first()
-            if last_invoice:
-                last_number = int(last_invoice.invoice_no[-3:])
-                next_number = f"{last_number+1:03d}"
-            else:
-                next_number = "001"
-            self.invoice_no = f"{prefix}{next_number}"
+            today = timezone.now().date()
+            using = kwargs.get('using') or router.db_for_write(Invoice, instance=self)
+            next_number = InvoiceSequence.next_number(today, using=using)
+            # At least three digits; grows past 999 invoices per day
+            self.invoice_no = f"INV-{today:%Y%m%d}-{next_number:03d}"
         
         # Automatically update payment status when saving
         self.update_payment_status()
@@ -76,6 +172,12 @@ class Product(models.Model):
     stock = models.IntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Ordered prefix lookups for product search (see search.py)
+            models.Index(Lower('name'), name='product_name_lower_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -83,11 +185,19 @@ class Product(models.Model):
 class Sale(models.Model):
     invoice = models.ForeignKey('Invoice', on_delete=models.CASCADE, related_name='items', null=True, blank=True)
     item = models.CharField(max_length=255, null=True, blank=True)
+    # Product sold; item keeps the product name as it was at the time of sale.
+    # Older rows are linked by the backfill_sale_products command.
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, related_name='sales', null=True, blank=True)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, null=True, blank=True)
     quantity = models.IntegerField(default=1, null=True, blank=True)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0, null=True, blank=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['item'], name='sale_item_idx'),
+        ]
+
     def __str__(self):
         return f"{self.item} - {self.quantity} units"
 
@@ -115,6 +225,84 @@ class StockMovement(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stockmove_product_created_idx'),
+            models.Index(fields=['reference'], name='stockmove_reference_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.movement_type}: {self.quantity_change}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Periodic copy of a product's stock level.
+    
+    Stock at a point in time is the latest snapshot before it plus the
+    StockMovement rows recorded after the snapshot, instead of a replay of
+    the whole ledger.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    stock = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)  # Highest StockMovement id of the product included
+    taken_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['product', 'taken_at'], name='stocksnap_product_taken_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name}: {self.stock} at {self.taken_at}"
+
+
+class PdfDocument(models.Model):
+    """
+    A rendered PDF of a receipt or a daily report, doubling as its render job.
+    
+    Rows waiting for the worker are 'pending'. A change to the underlying
+    invoices puts the row back to 'pending' and bumps its generation, so a
+    render that was already running for the old content is discarded instead
+    of marked ready (see sales_app/pdf.py).
+    """
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('daily_report', 'Daily Report'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, null=True, blank=True, related_name='pdf_documents')
+    report_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    generation = models.PositiveIntegerField(default=0)  # Bumped on every invalidation
+    content_hash = models.CharField(max_length=64, blank=True)  # SHA-256 of the PDF
+    file_path = models.CharField(max_length=255, blank=True)  # Relative to MEDIA_ROOT
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    rendered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['invoice'], condition=models.Q(kind='receipt'), name='pdfdoc_unique_receipt',
+            ),
+            models.UniqueConstraint(
+                fields=['report_date'], condition=models.Q(kind='daily_report'), name='pdfdoc_unique_daily_report',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'requested_at'], name='pdfdoc_status_requested_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.product.name} - {self.movement_type}: {self.quantity_change}"
\ No newline at end of file
+        subject = self.invoice_id if self.kind == 'receipt' else self.report_date
+        return f"{self.get_kind_display()} {subject} ({self.status})"
@@ -0,0 +1,116 @@
+"""
+Keyset (seek) pagination for invoice lists.
+
+OFFSET pagination reads and discards every row before the requested page, so
+late pages of a wide search get slower and slower. Keyset pagination instead
+remembers the sort key of the last row shown, (date_of_sale, id), and asks
+for the rows after it, which the (date_of_sale, id) index answers directly
+for any page.
+
+Invoices are listed newest first; invoices without a date come last.
+"""
+
+from datetime import date
+
+from django.db.models import F, Q
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_cursor(invoice):
+    """Encode the sort key of an invoice as a URL-safe cursor ('YYYY-MM-DD_id')"""
+    day = invoice.date_of_sale.isoformat() if invoice.date_of_sale else ''
+    return f'{day}_{invoice.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Returns:
+        tuple: (date_of_sale or None, id), or None if the cursor is malformed
+    """
+    try:
+        day, pk = cursor.rsplit('_', 1)
+        return (date.fromisoformat(day) if day else None, int(pk))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _after(day, pk):
+    """Rows that come after (day, pk) in newest-first order"""
+    if day is None:
+        return Q(date_of_sale__isnull=True, pk__lt=pk)
+    return (
+        Q(date_of_sale__lt=day)
+        | Q(date_of_sale=day, pk__lt=pk)
+        | Q(date_of_sale__isnull=True)
+    )
+
+
+def _before(day, pk):
+    """Rows that come before (day, pk) in newest-first order"""
+    if day is None:
+        return Q(date_of_sale__isnull=False) | Q(date_of_sale__isnull=True, pk__gt=pk)
+    return Q(date_of_sale__gt=day) | Q(date_of_sale=day, pk__gt=pk)
+
+
+class KeysetPage:
+    """One page of invoices with cursors for the neighbouring pages"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def keyset_paginate(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of invoices in (date_of_sale, id) newest-first order.
+
+    Args:
+        queryset: Filtered Invoice queryset (any ordering is replaced)
+        after: Cursor of the last row of the previous page (next page)
+        before: Cursor of the first row of the following page (previous page)
+        page_size: Number of invoices per page
+
+    Returns:
+        KeysetPage: The invoices of the page and cursors to move on
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before else None
+
+    if before_key is not None:
+        # Walk backwards from the cursor, then restore newest-first order
+        rows = list(
+            queryset.filter(_before(*before_key))
+            .order_by(F('date_of_sale').asc(nulls_first=True), 'pk')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]) if rows else None,
+            previous_cursor=encode_cursor(rows[0]) if rows and has_more else None,
+        )
+
+    if after_key is not None:
+        queryset = queryset.filter(_after(*after_key))
+    rows = list(
+        queryset.order_by(F('date_of_sale').desc(nulls_last=True), '-pk')[:page_size + 1]
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if rows and has_more else None,
+        previous_cursor=encode_cursor(rows[0]) if rows and after_key is not None else None,
+    )
@@ -0,0 +1,209 @@
+"""
+PDF receipts and daily reports, rendered in the background and cached.
+
+Web requests never render a PDF. They look up the PdfDocument of the receipt
+or day: a ready document is served straight from MEDIA_ROOT, anything else
+is queued and the client is asked to come back. The ``process_pdf_jobs``
+worker claims pending documents, renders them with the same templates as
+the print views and stores each file under the hash of its content
+(pdfs/<tenant database>/<hash[:2]>/<hash>.pdf), so identical renders share
+one file and a stored file is never overwritten.
+
+Saving or deleting an invoice puts its receipt and the daily report of its
+date back in the queue, once per save (see signals.py); views that change a
+sale line on its own send sale_lines_changed, which does the same. A render
+that was running at that moment is discarded, as the document's generation
+no longer matches.
+
+A document that failed max_attempts times stays failed until a user asks
+for another try (retry_pdf_document). WeasyPrint is in requirements.txt; a
+process without it cannot render, and the PDF views say so instead of
+waiting for a worker (see pdf_rendering_available).
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Invoice, PdfDocument
+from .printing import render_invoices_print
+
+try:
+    import weasyprint
+except ImportError:  # Missing system libraries; see pdf_rendering_available()
+    weasyprint = None
+
+PDF_DIRECTORY = 'pdfs'
+
+
+def pdf_rendering_available():
+    """Check whether WeasyPrint could be imported"""
+    return weasyprint is not None
+
+
+def html_to_pdf(html):
+    """
+    Convert an HTML document to PDF.
+
+    Raises:
+        ImproperlyConfigured: If WeasyPrint is not installed
+    """
+    if weasyprint is None:
+        raise ImproperlyConfigured('Rendering PDFs requires WeasyPrint (pip install weasyprint)')
+    return weasyprint.HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf()
+
+
+def _requeue(documents):
+    """Put documents back in the queue, discarding any render in progress"""
+    return documents.update(
+        status='pending',
+        generation=F('generation') + 1,
+        content_hash='',
+        file_path='',
+        attempts=0,
+        error='',
+        requested_at=timezone.now(),
+        claimed_at=None,
+    )
+
+
+def get_pdf_document(kind, invoice=None, report_date=None):
+    """
+    Get the PDF document of a receipt or daily report, queueing it if needed.
+
+    Args:
+        kind: 'receipt' or 'daily_report'
+        invoice: Invoice of a receipt
+        report_date: Date of a daily report
+
+    Returns:
+        PdfDocument: Ready to serve if its status is 'ready', 'failed' if
+        rendering gave up; otherwise it is queued for the worker (documents
+        whose file went missing are queued again)
+    """
+    lookup = {'invoice': invoice} if kind == 'receipt' else {'report_date': report_date}
+    document, created = PdfDocument.objects.get_or_create(kind=kind, **lookup)
+    if document.status == 'ready' and not default_storage.exists(document.file_path):
+        _requeue(PdfDocument.objects.filter(pk=document.pk))
+        document.refresh_from_db()
+    return document
+
+
+def retry_pdf_document(document):
+    """Queue a failed document again"""
+    _requeue(PdfDocument.objects.filter(pk=document.pk, status='failed'))
+    document.refresh_from_db()
+    return document
+
+
+def invalidate_invoice_pdfs(invoice_id, dates=None, using=None):
+    """
+    Queue the receipt of an invoice and the daily reports of its dates again.
+
+    Args:
+        invoice_id: Invoice that changed
+        dates: Sale dates whose daily reports are affected; defaults to the
+            invoice's current date (looked up in the same query)
+        using: Database alias
+    """
+    if dates is None:
+        dates = Invoice.objects.using(using).filter(pk=invoice_id).values('date_of_sale')
+    else:
+        dates = {day for day in dates if day}
+    # Pending documents have not been rendered yet, so there is nothing to discard
+    _requeue(
+        PdfDocument.objects.using(using)
+        .filter(Q(kind='receipt', invoice_id=invoice_id) | Q(kind='daily_report', report_date__in=dates))
+        .exclude(status='pending')
+    )
+
+
+def claim_next_document(timeout=300):
+    """
+    Claim the oldest pending document of the current tenant.
+
+    Args:
+        timeout: Seconds after which a running document is considered
+            abandoned (worker crashed) and may be claimed again
+
+    Returns:
+        PdfDocument or None: The claimed document, now 'running'
+    """
+    abandoned = timezone.now() - timedelta(seconds=timeout)
+    queue = PdfDocument.objects.filter(
+        Q(status='pending') | Q(status='running', claimed_at__lt=abandoned)
+    ).order_by('requested_at', 'pk')
+    while True:
+        candidate = queue.values('pk', 'generation', 'status', 'claimed_at').first()
+        if candidate is None:
+            return None
+        # Conditional UPDATE: only one worker wins the row, on any backend
+        claimed = PdfDocument.objects.filter(**candidate).update(
+            status='running', claimed_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return PdfDocument.objects.select_related('invoice').get(pk=candidate['pk'])
+
+
+def render_document_html(document):
+    """Render the HTML of a document with the print view templates"""
+    if document.kind == 'receipt':
+        invoice = document.invoice
+        items = invoice.items.exclude(item__isnull=True).exclude(item__exact='')
+        return render_to_string('sales_app/receipt_print.html', {'invoice': invoice, 'items': items})
+
+    invoices = Invoice.objects.filter(date_of_sale=document.report_date).order_by('invoice_no')
+    return ''.join(render_invoices_print(invoices, {
+        'print_date': document.report_date,
+        'print_type': 'daily',
+    }))
+
+
+def store_pdf(content, using):
+    """
+    Store PDF content under its hash.
+
+    Returns:
+        tuple: (SHA-256 hex digest, file name relative to MEDIA_ROOT)
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    name = f'{PDF_DIRECTORY}/{using}/{digest[:2]}/{digest}.pdf'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return digest, name
+
+
+def render_document(document, max_attempts=3):
+    """
+    Render a claimed document and record the result.
+
+    Args:
+        document: PdfDocument returned by claim_next_document()
+        max_attempts: Attempts before the document is marked 'failed'
+
+    Returns:
+        bool: True if the PDF was stored and the document is ready; False if
+        rendering failed or the document was invalidated meanwhile
+    """
+    current = PdfDocument.objects.filter(pk=document.pk, generation=document.generation)
+    try:
+        content = html_to_pdf(render_document_html(document))
+        digest, name = store_pdf(content, document._state.db)
+    except ImproperlyConfigured:
+        raise
+    except Exception as e:
+        current.update(
+            status='failed' if document.attempts >= max_attempts else 'pending',
+            error=str(e),
+        )
+        return False
+    return bool(current.update(
+        status='ready', content_hash=digest, file_path=name, rendered_at=timezone.now(), error='',
+    ))
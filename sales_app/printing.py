@@ -0,0 +1,97 @@
+"""
+Streamed invoice printouts.
+
+The daily and search printouts used to render the whole result set, with
+every invoice's items, into one response held in memory. They are now
+streamed: the header and summary (one aggregate query) go out first, then
+the invoice rows in chunks, each chunk fetched with
+``iterator(chunk_size=...)`` and its items prefetched for that chunk only,
+then the footer. Worker memory stays at one chunk whatever the size of the
+printout.
+
+The tenant middleware resets the tenant context once the view returns,
+before the response body is consumed. The generator therefore switches to
+the tenant around each chunk; the context is never held across a ``yield``.
+"""
+
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template
+
+from tenants.middleware import get_current_tenant
+from tenants.utils import switch_tenant_context
+
+DEFAULT_CHUNK_SIZE = 100
+
+HEADER_TEMPLATE = 'sales_app/invoices_print_header.html'
+ROWS_TEMPLATE = 'sales_app/invoices_print_rows.html'
+FOOTER_TEMPLATE = 'sales_app/invoices_print_footer.html'
+
+
+def _render_invoices(request, tenant, invoices, context, chunk_size):
+    """Yield the printout piece by piece: header, invoice chunks, footer"""
+    rows_template = get_template(ROWS_TEMPLATE)
+
+    with switch_tenant_context(tenant):
+        header = get_template(HEADER_TEMPLATE).render(context, request)
+    yield header
+
+    rows = invoices.iterator(chunk_size=chunk_size)
+    while True:
+        with switch_tenant_context(tenant):
+            chunk = list(islice(rows, chunk_size))
+            html = rows_template.render({'invoices': chunk}) if chunk else ''
+        if not chunk:
+            break
+        yield html
+
+    with switch_tenant_context(tenant):
+        footer = get_template(FOOTER_TEMPLATE).render(context, request)
+    yield footer
+
+
+def render_invoices_print(invoices, context, request=None, tenant=None):
+    """
+    Render the invoice printout for a filtered queryset, piece by piece.
+
+    Args:
+        invoices: Filtered and ordered Invoice queryset
+        context: Template context for the header and footer (print_type,
+            print_date or search_params)
+        request: The current request, if any (the footer names the user)
+        tenant: Tenant to switch to around each chunk (defaults to the
+            current tenant)
+
+    Returns:
+        Generator of HTML strings: header, invoice chunks, footer
+    """
+    chunk_size = max(1, getattr(settings, 'INVOICE_PRINT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    summary = invoices.order_by().aggregate(invoice_count=Count('id'), total_sales=Sum('total'))
+    context = {
+        **context,
+        'invoice_count': summary['invoice_count'],
+        'total_sales': summary['total_sales'] or 0,
+    }
+    invoices = invoices.select_related('user').prefetch_related('items')
+    return _render_invoices(request, tenant or get_current_tenant(), invoices, context, chunk_size)
+
+
+def stream_invoices_print(request, invoices, context):
+    """
+    Stream the invoice printout for a filtered queryset.
+
+    Args:
+        request: The current request
+        invoices: Filtered and ordered Invoice queryset
+        context: Template context for the header and footer
+
+    Returns:
+        StreamingHttpResponse: The printout, rendered as it is sent
+    """
+    return StreamingHttpResponse(
+        render_invoices_print(invoices, context, request),
+        content_type='text/html; charset=utf-8',
+    )
@@ -0,0 +1,237 @@
+"""
+Indexed product search for the autocomplete endpoints.
+
+``name__icontains`` cannot use a B-tree index, so every keystroke scanned the
+whole product table. Searches are answered from an index instead:
+
+- PostgreSQL: GIN trigram index (pg_trgm) on UPPER(name), which serves the
+  ILIKE-style lookups Django generates for istartswith/icontains.
+- SQLite: FTS5 table with the trigram tokenizer, kept in sync with the
+  product table by triggers (see migration 0013).
+
+Prefix matches are ranked before other substring matches. Optionally, a
+per-tenant in-process prefix index answers prefix lookups without touching
+the database (PRODUCT_SEARCH_PREFIX_INDEX); it is rebuilt when the tenant's
+catalog version changes.
+"""
+
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+from .catalog import get_catalog_version
+from .models import Product
+
+SQLITE_FTS_TABLE = 'sales_app_product_fts'
+
+# The trigram tokenizer can only use its index for patterns of 3+ characters
+MIN_TRIGRAM_LENGTH = 3
+
+
+class ProductSearchBackend:
+    """
+    Database-agnostic search using Django lookups.
+
+    Prefix lookups use the LOWER(name) B-tree index; on PostgreSQL substring
+    lookups are served by the trigram GIN index.
+    """
+
+    def __init__(self, using):
+        self.using = using
+
+    def queryset(self):
+        return Product.objects.using(self.using)
+
+    def prefix_matches(self, query):
+        # Range on LOWER(name) walks the functional B-tree index in order, so
+        # a LIMIT stops early even when thousands of names share the prefix
+        prefix = query.lower()
+        return (
+            self.queryset().annotate(name_lower=Lower('name'))
+            .filter(name_lower__gte=prefix, name_lower__lt=prefix + '\U0010ffff', name__istartswith=query)
+            .order_by('name_lower', 'pk')
+        )
+
+    def substring_matches(self, query, limit):
+        return self.queryset().filter(name__icontains=query)
+
+    def search(self, query, limit=10, prefix_results=None):
+        """
+        Find products whose name contains ``query``, prefix matches first.
+
+        Args:
+            query: Search term
+            limit: Maximum number of products to return
+            prefix_results: Prefix matches already found elsewhere (the
+                in-process prefix index); skips the prefix query
+
+        Returns:
+            list: Product instances, prefix matches first in name order
+        """
+        if prefix_results is None:
+            results = list(self.prefix_matches(query)[:limit])
+        else:
+            results = list(prefix_results)
+        if len(results) < limit and len(query) >= MIN_TRIGRAM_LENGTH:
+            # Substring matches only make sense (and use the index) from 3 characters
+            # At most len(results) of the first `limit` matches are prefix matches
+            results += list(
+                self.substring_matches(query, limit).exclude(pk__in=[product.pk for product in results])
+                [:limit - len(results)]
+            )
+        return results
+
+
+class SQLiteFTSBackend(ProductSearchBackend):
+    """
+    Substring search through the FTS5 trigram table of a SQLite tenant
+    database. Terms containing LIKE wildcards fall back to plain lookups.
+    """
+
+    def substring_matches(self, query, limit):
+        if '%' in query or '_' in query:
+            return super().substring_matches(query, limit)
+        # LIMIT inside the subquery stops the index scan early instead of
+        # collecting every match of a common term
+        return self.queryset().filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE name LIKE %s LIMIT %s',
+            [f'%{query}%', limit],
+        ))
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(using):
+    """
+    Get the search backend for a database alias.
+
+    The backend is chosen from the database vendor and whether the SQLite
+    FTS table exists (migration 0013 skips it if FTS5 is unavailable). Only
+    a found FTS table is remembered, so a database migrated later picks it up.
+
+    Args:
+        using: Database alias
+
+    Returns:
+        ProductSearchBackend: Backend for the alias
+    """
+    with _backends_lock:
+        backend = _backends.get(using)
+        if backend is None:
+            connection = connections[using]
+            if connection.vendor != 'sqlite':
+                backend = _backends[using] = ProductSearchBackend(using)
+            else:
+                try:
+                    has_fts = SQLITE_FTS_TABLE in connection.introspection.table_names()
+                except DatabaseError:
+                    has_fts = False
+                if not has_fts:
+                    return ProductSearchBackend(using)
+                backend = _backends[using] = SQLiteFTSBackend(using)
+        return backend
+
+
+class ProductPrefixIndex:
+    """
+    In-process prefix index of product names for one tenant database.
+
+    Names are kept lowercased in a sorted array, so a prefix lookup is a
+    binary search followed by a short slice, like walking a trie but without
+    a node per character.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.built_at = time.monotonic()
+        entries = sorted(
+            (name.lower(), pk)
+            for pk, name in Product.objects.using(using).values_list('pk', 'name').iterator()
+            if name
+        )
+        self._keys = [key for key, pk in entries]
+        self._ids = [pk for key, pk in entries]
+
+    def search(self, query, limit=10):
+        """
+        Get the ids of products whose name starts with ``query``.
+
+        Returns:
+            list: Up to ``limit`` primary keys in name order
+        """
+        prefix = query.lower()
+        start = bisect.bisect_left(self._keys, prefix)
+        ids = []
+        for index in range(start, min(start + limit, len(self._keys))):
+            if not self._keys[index].startswith(prefix):
+                break
+            ids.append(self._ids[index])
+        return ids
+
+
+class ProductPrefixIndexes:
+    """
+    Per-process prefix indexes by tenant database alias.
+
+    An index is rebuilt lazily when the tenant's catalog version changes
+    (see catalog.py) or when it is older than the TTL.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'PRODUCT_SEARCH_PREFIX_INDEX_TTL', 300)
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, using):
+        version = get_catalog_version(using)
+        with self._lock:
+            index = self._indexes.get(using)
+        if index is not None and (
+            index.version != version
+            or (self.ttl and time.monotonic() - index.built_at > self.ttl)
+        ):
+            index = None
+        if index is None:
+            index = ProductPrefixIndex(using)
+            index.version = version
+            with self._lock:
+                self._indexes[using] = index
+        return index
+
+
+product_prefix_indexes = ProductPrefixIndexes()
+
+
+def search_products(query, limit=10, using=None):
+    """
+    Search products by name for autocomplete, prefix matches first.
+
+    Args:
+        query: Search term typed by the user
+        limit: Maximum number of products to return
+        using: Database alias (defaults to the current tenant's database)
+
+    Returns:
+        list: Product instances; the first products in name order for an
+        empty query
+    """
+    query = (query or '').strip()
+    using = using or router.db_for_read(Product)
+    backend = get_search_backend(using)
+    if not query:
+        # Every name has the empty prefix: walks the name index from the start
+        return list(backend.prefix_matches(query)[:limit])
+
+    if not getattr(settings, 'PRODUCT_SEARCH_PREFIX_INDEX', False):
+        return backend.search(query, limit)
+
+    ids = product_prefix_indexes.get(using).search(query, limit)
+    products = Product.objects.using(using).in_bulk(ids)
+    return backend.search(query, limit, prefix_results=[products[pk] for pk in ids if pk in products])
@@ -0,0 +1,72 @@
+"""
+Signal handlers that keep the product catalog version and the cached PDF
+documents in sync.
+
+PDFs are invalidated per invoice, not per sale line: the views that save a
+formset save the invoice afterwards (to update its total), and deleting an
+invoice deletes its lines. A view that changes sale lines without saving
+their invoice sends sale_lines_changed instead.
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from .catalog import bump_catalog_version
+from .models import Invoice, Product
+from .pdf import invalidate_invoice_pdfs
+
+# Sent with ``invoice`` and ``using`` once the sale lines of an invoice were
+# changed without saving the invoice itself
+sale_lines_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, using, **kwargs):
+    """Invalidate cached searches and prefix indexes after a product is saved"""
+    bump_catalog_version(using)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, using, **kwargs):
+    """Invalidate cached searches and prefix indexes after a product is deleted"""
+    bump_catalog_version(using)
+
+
+@receiver(post_init, sender=Invoice)
+def invoice_loaded(sender, instance, **kwargs):
+    """Remember the sale date as loaded, to find the daily report it leaves"""
+    # __dict__ avoids a query when the field is deferred
+    instance._loaded_date_of_sale = instance.__dict__.get('date_of_sale')
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, using, **kwargs):
+    """Queue the invoice's receipt and daily report(s) for rendering again"""
+    invalidate_invoice_pdfs(
+        instance.pk, {instance.date_of_sale, instance._loaded_date_of_sale}, using=using,
+    )
+    instance._loaded_date_of_sale = instance.date_of_sale
+
+
+@receiver(pre_delete, sender=Invoice)
+def invoice_deleting(sender, instance, using, **kwargs):
+    """Read a deferred sale date while the row still exists"""
+    if 'date_of_sale' not in instance.__dict__:
+        instance._loaded_date_of_sale = (
+            Invoice._base_manager.using(using).filter(pk=instance.pk)
+            .values_list('date_of_sale', flat=True).first()
+        )
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, using, **kwargs):
+    """Queue the daily report of a deleted invoice for rendering again"""
+    invalidate_invoice_pdfs(
+        instance.pk, {instance.__dict__.get('date_of_sale'), instance._loaded_date_of_sale}, using=using,
+    )
+
+
+@receiver(sale_lines_changed)
+def invoice_lines_changed(sender, invoice, using, **kwargs):
+    """Queue the invoice's receipt and daily report for rendering again"""
+    invalidate_invoice_pdfs(invoice.pk, {invoice.date_of_sale}, using=using)
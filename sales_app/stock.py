@@ -0,0 +1,398 @@
+"""
+Set-based stock validation and updates for sales.
+
+All products touched by a sale are locked with one ``IN`` query, ordered by
+primary key so concurrent checkouts always lock rows in the same order and
+cannot deadlock. Shortfalls are reported together, and the stock changes are
+applied with one ``UPDATE ... CASE`` statement using ``F()`` expressions.
+Every change is recorded in the StockMovement ledger with one bulk_create.
+Quantities are keyed by product id (Sale.product), never by product name.
+
+These functions must be called inside ``transaction.atomic(using=...)`` on
+the tenant's database (``router.db_for_write(Product)``); a plain
+``transaction.atomic()`` only covers the default database, so the row locks
+would not be held and a failed sale would not be rolled back.
+take_stock_snapshots() manages its own transactions.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import Case, F, IntegerField, Max, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product, StockMovement, StockSnapshot
+
+
+def aggregate_quantities(formset_data):
+    """
+    Sum the requested quantity per product.
+
+    Args:
+        formset_data: Iterable of SaleForm cleaned_data dicts
+
+    Returns:
+        dict: {product_id: total_quantity}, skipping deleted and empty rows
+    """
+    quantities = {}
+    for form_data in formset_data:
+        if form_data and not form_data.get('DELETE', False):
+            product = form_data.get('product')
+            quantity = form_data.get('quantity') or 0
+            if product is not None and quantity > 0:
+                quantities[product.pk] = quantities.get(product.pk, 0) + quantity
+    return quantities
+
+
+def lock_products(product_ids):
+    """
+    Lock the products with the given ids in a single query.
+
+    Rows are locked in primary key order so concurrent sales cannot deadlock.
+
+    Returns:
+        dict: {product_id: Product}
+    """
+    if not product_ids:
+        return {}
+    locked = Product.objects.select_for_update().filter(pk__in=list(product_ids)).order_by('pk')
+    return {product.pk: product for product in locked}
+
+
+def find_shortfalls(requirements, products):
+    """
+    Check locked products against the quantities a sale needs.
+
+    Args:
+        requirements: {product_id: quantity_needed}
+        products: {product_id: Product} as returned by lock_products()
+
+    Returns:
+        list: One error message per missing or insufficient product
+    """
+    errors = []
+    for product_id, total_needed in requirements.items():
+        product = products.get(product_id)
+        if product is None:
+            errors.append(f"Product #{product_id} not found in inventory.")
+        elif product.stock is None or product.stock < total_needed:
+            available = product.stock or 0
+            errors.append(
+                f"Insufficient stock for '{product.name}'. "
+                f"Needed: {total_needed}, Available: {available}"
+            )
+    return errors
+
+
+def apply_stock_changes(changes, products, movement_type, reference=None, user=None, notes=None):
+    """
+    Apply stock changes to locked products with one UPDATE statement and
+    record them in the StockMovement ledger with one bulk_create.
+
+    Args:
+        changes: {product_id: quantity_change} (negative to deduct)
+        products: {product_id: Product} as returned by lock_products()
+        movement_type: StockMovement.MOVEMENT_TYPES value, or a callable
+            taking the change and returning one
+        reference: Invoice number or other reference stored on each movement
+        user: User recorded as created_by
+        notes: Optional notes stored on each movement
+
+    Returns:
+        list: Created StockMovement instances
+    """
+    changes = {
+        product_id: change for product_id, change in changes.items()
+        if change and product_id in products
+    }
+    if not changes:
+        return []
+
+    whens = [
+        When(pk=product_id, then=Coalesce(F('stock'), Value(0)) + Value(change))
+        for product_id, change in changes.items()
+    ]
+    Product.objects.filter(pk__in=list(changes)).update(
+        stock=Case(*whens, default=F('stock'), output_field=IntegerField())
+    )
+    # Queryset updates send no signals; cached product searches show stock
+    bump_catalog_version()
+
+    # Keep the locked instances in sync with the database and build the ledger
+    movements = []
+    for product_id, change in changes.items():
+        product = products[product_id]
+        stock_before = product.stock or 0
+        product.stock = stock_before + change
+        movements.append(StockMovement(
+            product=product,
+            movement_type=movement_type(change) if callable(movement_type) else movement_type,
+            quantity_change=change,
+            stock_before=stock_before,
+            stock_after=product.stock,
+            reference=reference,
+            notes=notes,
+            created_by=user,
+        ))
+    return StockMovement.objects.bulk_create(movements)
+
+
+def check_stock(requirements):
+    """
+    Lock the products of a sale and check that their stock covers it.
+
+    Called before the invoice is saved, so a shortfall leaves nothing behind.
+
+    Args:
+        requirements: {product_id: quantity} as returned by aggregate_quantities()
+
+    Returns:
+        dict: {product_id: Product}, locked until the transaction ends
+
+    Raises:
+        ValidationError: With every shortfall if any product lacks stock
+    """
+    products = lock_products(requirements)
+    errors = find_shortfalls(requirements, products)
+    if errors:
+        raise ValidationError(errors)
+    return products
+
+
+def deduct_stock(requirements, reference=None, user=None, products=None):
+    """
+    Lock, validate and deduct stock for a sale.
+
+    Args:
+        requirements: {product_id: quantity} as returned by aggregate_quantities()
+        reference: Invoice number recorded in the ledger
+        user: User recorded in the ledger
+        products: Products already locked and checked by check_stock()
+
+    Returns:
+        dict: {product_id: Product} with updated stock values
+
+    Raises:
+        ValidationError: With every shortfall if any product lacks stock;
+        nothing is deducted in that case.
+    """
+    if products is None:
+        products = check_stock(requirements)
+    apply_stock_changes(
+        {product_id: -quantity for product_id, quantity in requirements.items()},
+        products, 'SALE', reference=reference, user=user,
+    )
+    return products
+
+
+def restore_stock(quantities, reference=None, user=None):
+    """
+    Lock and add quantities back to stock (deleted or edited sales).
+
+    Products that no longer exist are skipped.
+
+    Args:
+        quantities: {product_id: quantity}
+        reference: Invoice number recorded in the ledger
+        user: User recorded in the ledger
+
+    Returns:
+        dict: {product_id: Product} with updated stock values
+    """
+    products = lock_products(quantities)
+    apply_stock_changes(quantities, products, 'RETURN', reference=reference, user=user)
+    return products
+
+
+def reconcile_stock(old_quantities, new_quantities, reference=None, user=None):
+    """
+    Apply only the net stock change between two versions of a sale.
+
+    Used when an invoice is edited: instead of restoring every original line
+    and deducting every new one, only products whose net quantity changed are
+    locked and updated, in one batch.
+
+    Args:
+        old_quantities: {product_id: quantity} before the edit
+        new_quantities: {product_id: quantity} after the edit
+        reference: Invoice number recorded in the ledger
+        user: User recorded in the ledger
+
+    Returns:
+        dict: {product_id: stock_change} that was applied (positive values
+        were returned to stock)
+
+    Raises:
+        ValidationError: With every shortfall if the increased quantities are
+        not available; nothing is changed in that case.
+    """
+    changes = {}
+    for product_id in list(old_quantities) + [p for p in new_quantities if p not in old_quantities]:
+        change = old_quantities.get(product_id, 0) - new_quantities.get(product_id, 0)
+        if change:
+            changes[product_id] = change
+    if not changes:
+        return changes
+
+    products = lock_products(changes)
+    additional = {product_id: -change for product_id, change in changes.items() if change < 0}
+    errors = find_shortfalls(additional, products)
+    if errors:
+        raise ValidationError(errors)
+    apply_stock_changes(
+        changes, products,
+        lambda change: 'RETURN' if change > 0 else 'SALE',
+        reference=reference, user=user, notes='Invoice edited',
+    )
+    return changes
+
+
+def resolve_product_names(names):
+    """
+    Map product names to product ids with one query.
+
+    Used for Sale rows saved before they were linked to a Product. If several
+    products share a name, the oldest one is used.
+
+    Returns:
+        dict: {product_name: product_id} for the names that match a product
+    """
+    resolved = {}
+    if names:
+        matches = Product.objects.filter(name__in=list(names)).order_by('pk').values_list('name', 'pk')
+        for name, product_id in matches:
+            resolved.setdefault(name, product_id)
+    return resolved
+
+
+def sale_item_quantities(sale_items):
+    """
+    Sum quantities per product for saved Sale rows.
+
+    Rows without a product link (not backfilled yet) are matched by name.
+
+    Returns:
+        dict: {product_id: total_quantity}
+    """
+    sale_items = [sale_item for sale_item in sale_items if sale_item.quantity]
+    by_name = resolve_product_names({
+        sale_item.item for sale_item in sale_items
+        if sale_item.product_id is None and sale_item.item
+    })
+    quantities = {}
+    for sale_item in sale_items:
+        product_id = sale_item.product_id or by_name.get(sale_item.item)
+        if product_id is not None:
+            quantities[product_id] = quantities.get(product_id, 0) + sale_item.quantity
+    return quantities
+
+
+def record_adjustment(product, stock_before, user=None, movement_type='ADJUSTMENT', notes=None):
+    """
+    Record a manual stock change (product created or edited) in the ledger.
+
+    Args:
+        product: Saved Product with its new stock value
+        stock_before: Stock before the change
+
+    Returns:
+        StockMovement: The created movement, or None if stock did not change
+    """
+    stock_before = stock_before or 0
+    stock_after = product.stock or 0
+    if stock_after == stock_before:
+        return None
+    return StockMovement.objects.create(
+        product=product,
+        movement_type=movement_type,
+        quantity_change=stock_after - stock_before,
+        stock_before=stock_before,
+        stock_after=stock_after,
+        notes=notes,
+        created_by=user,
+    )
+
+
+def take_stock_snapshots(batch_size=1000, using=None):
+    """
+    Snapshot the current stock of every product.
+
+    Products are snapshotted in batches, each in its own transaction. The
+    batch's rows are locked first, so no sale can change their stock or add
+    movements for them until their stock and the id of their latest
+    movement have been read; a snapshot therefore includes exactly the
+    movements up to its last_movement_id. Locks are held for one batch only.
+
+    Args:
+        batch_size: Products per batch
+        using: Database alias (defaults to the current tenant's database)
+
+    Returns:
+        int: Number of snapshots created
+    """
+    using = using or router.db_for_write(Product)
+    created = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(
+                Product.objects.using(using).select_for_update()
+                .filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'stock')[:batch_size]
+            )
+            if not batch:
+                return created
+            product_ids = [product_id for product_id, stock in batch]
+            last_movements = dict(
+                StockMovement.objects.using(using).filter(product_id__in=product_ids)
+                .values('product_id').annotate(last_id=Max('pk'))
+                .values_list('product_id', 'last_id')
+            )
+            # Every movement included was committed before the locks were granted
+            taken_at = timezone.now()
+            StockSnapshot.objects.using(using).bulk_create([
+                StockSnapshot(
+                    product_id=product_id,
+                    stock=stock or 0,
+                    last_movement_id=last_movements.get(product_id, 0),
+                    taken_at=taken_at,
+                )
+                for product_id, stock in batch
+            ])
+        created += len(batch)
+        last_pk = product_ids[-1]
+
+
+def stock_at(product, when):
+    """
+    Get a product's stock level at a point in time.
+
+    Uses the latest snapshot taken before ``when`` plus the ledger entries
+    recorded after that snapshot. Without a snapshot, the first movement
+    after ``when`` (or the current stock) gives the answer.
+
+    Args:
+        product: Product instance
+        when: Aware datetime
+
+    Returns:
+        int: Stock level at ``when``
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(product=product, taken_at__lte=when)
+        .order_by('-taken_at', '-pk').first()
+    )
+    if snapshot is not None:
+        replay = StockMovement.objects.filter(
+            product=product, pk__gt=snapshot.last_movement_id, created_at__lte=when,
+        ).aggregate(total=Sum('quantity_change'))['total'] or 0
+        return snapshot.stock + replay
+
+    next_movement = (
+        StockMovement.objects.filter(product=product, created_at__gt=when)
+        .order_by('created_at', 'pk').first()
+    )
+    if next_movement is not None:
+        return next_movement.stock_before
+    return product.stock or 0
@@ -1,3 +1,346 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tenants.testing import TenantTestCase
+
+from .catalog import get_catalog_version
+from .models import (
+    CatalogVersion, Invoice, InvoiceSequence, PdfDocument, Product, Sale, StockMovement, StockSnapshot,
+)
+from .pagination import keyset_paginate
+from .search import search_products
+from .stock import deduct_stock, reconcile_stock, stock_at, take_stock_snapshots
+
+
+def sale_entry_data(lines, customer_name='Bob'):
+    """POST data of the sales entry form for [(product, quantity), ...]"""
+    data = {
+        'customer_name': customer_name,
+        'date_of_sale': date.today().isoformat(),
+        'notes': '',
+        'amount_paid': '0',
+        'items-TOTAL_FORMS': str(len(lines)),
+        'items-INITIAL_FORMS': '0',
+        'items-MIN_NUM_FORMS': '0',
+        'items-MAX_NUM_FORMS': '1000',
+    }
+    for index, (product, quantity) in enumerate(lines):
+        data.update({
+            f'items-{index}-item': str(product.pk),
+            f'items-{index}-unit_price': str(product.price),
+            f'items-{index}-quantity': str(quantity),
+            f'items-{index}-discount': '0',
+            f'items-{index}-total_price': str(product.price * quantity),
+        })
+    return data
+
+
+def messages_of(response):
+    return [str(message) for message in response.context['messages']]
+
+
+class SalesEntryStockTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.login('Cashiers')
+        self.pen = Product.objects.create(name='Pen', price=Decimal('2.00'), stock=10)
+        self.ink = Product.objects.create(name='Ink', price=Decimal('5.00'), stock=1)
+
+    def test_sale_deducts_stock_and_records_movements(self):
+        response = self.client.post(reverse('sales_entry'), sale_entry_data([(self.pen, 3), (self.ink, 1)]))
+
+        self.assertEqual(response.status_code, 302)
+        invoice = Invoice.objects.get()
+        self.assertEqual(invoice.total, Decimal('11.00'))
+        self.assertEqual(invoice.items.count(), 2)
+        self.pen.refresh_from_db()
+        self.ink.refresh_from_db()
+        self.assertEqual((self.pen.stock, self.ink.stock), (7, 0))
+        self.assertEqual(
+            set(StockMovement.objects.values_list('product__name', 'quantity_change', 'reference')),
+            {('Pen', -3, invoice.invoice_no), ('Ink', -1, invoice.invoice_no)},
+        )
+
+    def test_shortfall_leaves_no_invoice_sales_or_stock_change(self):
+        response = self.client.post(reverse('sales_entry'), sale_entry_data([(self.pen, 3), (self.ink, 2)]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(messages_of(response), ["Insufficient stock for 'Ink'. Needed: 2, Available: 1"])
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+        # No invoice number was used up either
+        self.assertFalse(InvoiceSequence.objects.exists())
+        self.pen.refresh_from_db()
+        self.ink.refresh_from_db()
+        self.assertEqual((self.pen.stock, self.ink.stock), (10, 1))
+
+    def test_repeated_product_lines_are_checked_together(self):
+        response = self.client.post(reverse('sales_entry'), sale_entry_data([(self.ink, 1), (self.ink, 1)]))
+
+        self.assertEqual(messages_of(response), ["Insufficient stock for 'Ink'. Needed: 2, Available: 1"])
+        self.assertFalse(Invoice.objects.exists())
+        self.ink.refresh_from_db()
+        self.assertEqual(self.ink.stock, 1)
+
+
+class StockLedgerTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pen = Product.objects.create(name='Pen', price=Decimal('2.00'), stock=10)
+        self.ink = Product.objects.create(name='Ink', price=Decimal('5.00'), stock=4)
+
+    def test_snapshot_records_the_latest_movement_of_each_product(self):
+        deduct_stock({self.pen.pk: 3}, reference='INV-1')
+        pen_movement = StockMovement.objects.get(product=self.pen)
+        deduct_stock({self.ink.pk: 1}, reference='INV-2')
+
+        self.assertEqual(take_stock_snapshots(batch_size=1), 2)
+
+        snapshots = {snapshot.product_id: snapshot for snapshot in StockSnapshot.objects.all()}
+        self.assertEqual(snapshots[self.pen.pk].stock, 7)
+        self.assertEqual(snapshots[self.pen.pk].last_movement_id, pen_movement.pk)
+        self.assertEqual(snapshots[self.ink.pk].stock, 3)
+
+    def test_stock_at_replays_movements_after_the_snapshot_only(self):
+        deduct_stock({self.pen.pk: 3}, reference='INV-1')
+        take_stock_snapshots()
+        snapshot = StockSnapshot.objects.get(product=self.pen)
+        deduct_stock({self.pen.pk: 2}, reference='INV-2')
+        self.pen.refresh_from_db()
+
+        self.assertEqual(stock_at(self.pen, snapshot.taken_at), 7)
+        self.assertEqual(stock_at(self.pen, timezone.now()), 5)
+        self.assertEqual(self.pen.stock, 5)
+
+    def test_stock_at_without_snapshot_uses_the_next_movement(self):
+        before = timezone.now() - timedelta(seconds=1)
+        deduct_stock({self.pen.pk: 3}, reference='INV-1')
+
+        self.assertEqual(stock_at(self.pen, before), 10)
+        self.assertEqual(stock_at(self.ink, before), 4)
+
+    def test_product_edit_records_an_adjustment(self):
+        self.login('Managers')
+
+        response = self.client.post(
+            reverse('edit_product', args=[self.pen.pk]), {'name': 'Pen', 'price': '2.00', 'stock': '15'},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        movement = StockMovement.objects.get(product=self.pen)
+        self.assertEqual(
+            (movement.movement_type, movement.quantity_change, movement.stock_before, movement.stock_after),
+            ('ADJUSTMENT', 5, 10, 15),
+        )
+
+
+class ReconcileStockTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pen = Product.objects.create(name='Pen', price=Decimal('2.00'), stock=10)
+        self.ink = Product.objects.create(name='Ink', price=Decimal('5.00'), stock=1)
+        self.paper = Product.objects.create(name='Paper', price=Decimal('1.00'), stock=5)
+
+    def stock(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_only_net_changes_are_applied(self):
+        changes = reconcile_stock(
+            {self.pen.pk: 2, self.ink.pk: 1, self.paper.pk: 3},
+            {self.pen.pk: 5, self.ink.pk: 1},
+            reference='INV-1',
+        )
+
+        self.assertEqual(changes, {self.pen.pk: -3, self.paper.pk: 3})
+        self.assertEqual(self.stock(), {'Pen': 7, 'Ink': 1, 'Paper': 8})
+        self.assertEqual(
+            set(StockMovement.objects.values_list('product__name', 'movement_type', 'quantity_change')),
+            {('Pen', 'SALE', -3), ('Paper', 'RETURN', 3)},
+        )
+
+    def test_shortfall_changes_nothing(self):
+        with self.assertRaisesMessage(ValidationError, "Insufficient stock for 'Ink'"):
+            reconcile_stock({self.pen.pk: 2, self.ink.pk: 1}, {self.pen.pk: 1, self.ink.pk: 3})
+
+        self.assertEqual(self.stock(), {'Pen': 10, 'Ink': 1, 'Paper': 5})
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_unchanged_sale_locks_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(reconcile_stock({self.pen.pk: 2}, {self.pen.pk: 2}), {})
+
+
+class KeysetPaginationTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        days = [today, today, today - timedelta(days=1), None, today - timedelta(days=3), today, None]
+        Invoice.objects.bulk_create([
+            Invoice(invoice_no=f'INV-{index}', date_of_sale=day) for index, day in enumerate(days)
+        ])
+        # Newest first, same day by id descending, undated last
+        self.expected = ['INV-5', 'INV-1', 'INV-0', 'INV-2', 'INV-4', 'INV-6', 'INV-3']
+
+    def walk(self, page_size=3):
+        pages = [keyset_paginate(Invoice.objects.all(), page_size=page_size)]
+        while pages[-1].has_next:
+            pages.append(keyset_paginate(Invoice.objects.all(), after=pages[-1].next_cursor, page_size=page_size))
+        return pages
+
+    def numbers(self, page):
+        return [invoice.invoice_no for invoice in page.object_list]
+
+    def test_next_pages_list_every_invoice_once_in_order(self):
+        pages = self.walk()
+
+        self.assertEqual([number for page in pages for number in self.numbers(page)], self.expected)
+        self.assertEqual([len(page.object_list) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+    def test_previous_pages_walk_back_to_the_first_page(self):
+        pages = self.walk()
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = keyset_paginate(Invoice.objects.all(), before=page.previous_cursor, page_size=3)
+            self.assertEqual(self.numbers(page), self.numbers(expected))
+        self.assertFalse(page.has_previous)
+
+    def test_malformed_cursor_shows_the_first_page(self):
+        page = keyset_paginate(Invoice.objects.all(), after='not-a-cursor', page_size=3)
+
+        self.assertEqual(self.numbers(page), self.expected[:3])
+
+
+class ProductSearchTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ['Pencil', 'Ink', 'Blue Pen', 'Pen', 'Paper']:
+            Product.objects.create(name=name, price=Decimal('1.00'), stock=5)
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual([product.name for product in search_products('pen')], ['Pen', 'Pencil', 'Blue Pen'])
+
+    def test_empty_query_lists_products_in_name_order(self):
+        self.assertEqual(
+            [product.name for product in search_products('', limit=3)], ['Blue Pen', 'Ink', 'Paper'],
+        )
+
+    def test_autocomplete_without_query_returns_first_products(self):
+        response = self.client.get(reverse('product_autocomplete'))
+
+        self.assertEqual(
+            [item['name'] for item in response.json()], ['Blue Pen', 'Ink', 'Paper', 'Pen', 'Pencil'],
+        )
+
+
+class CatalogVersionTests(TenantTestCase):
+    def test_product_writes_bump_the_version_on_commit(self):
+        self.assertEqual(get_catalog_version(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pen = Product.objects.create(name='Pen', price=Decimal('2.00'), stock=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            deduct_stock({pen.pk: 1})
+
+        self.assertEqual(get_catalog_version(), 2)
+
+    def test_version_is_read_from_the_tenant_database(self):
+        # As written by another process
+        CatalogVersion.objects.create(pk=1, version=5)
+
+        self.assertEqual(get_catalog_version(), 5)
+
+    def test_autocomplete_etag_changes_with_the_catalog(self):
+        first = self.client.get(reverse('product_autocomplete'), {'q': 'pen'})
+        self.assertEqual(first.json(), [])
+        self.assertEqual(
+            self.client.get(reverse('product_autocomplete'), {'q': 'pen'}, HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+            304,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Pen', price=Decimal('2.00'), stock=10)
+        response = self.client.get(reverse('product_autocomplete'), {'q': 'pen'}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()], ['Pen'])
+
+
+class PdfDocumentTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        renderer = mock.patch('sales_app.pdf.weasyprint', object())
+        renderer.start()
+        self.addCleanup(renderer.stop)
+        self.login('Managers')
+        self.pen = Product.objects.create(name='Pen', price=Decimal('2.00'), stock=10)
+        self.invoice = Invoice.objects.create(customer_name='Bob', date_of_sale=date.today(), total=Decimal('6.00'))
+        for quantity in (1, 1, 1):
+            Sale.objects.create(
+                invoice=self.invoice, item='Pen', product=self.pen, quantity=quantity,
+                unit_price=Decimal('2.00'), total_price=Decimal('2.00'),
+            )
+        self.receipt = PdfDocument.objects.create(
+            kind='receipt', invoice=self.invoice, status='ready', file_path='pdfs/receipt.pdf',
+        )
+        self.report = PdfDocument.objects.create(
+            kind='daily_report', report_date=date.today(), status='ready', file_path='pdfs/report.pdf',
+        )
+
+    def pdf_updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "sales_app_pdfdocument"')]
+
+    def test_invoice_delete_invalidates_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.invoice.delete()
+
+        self.assertEqual(len(self.pdf_updates(queries)), 1)
+        self.report.refresh_from_db()
+        self.assertEqual((self.report.status, self.report.generation), ('pending', 1))
+
+    def test_invoice_save_invalidates_once_whatever_the_number_of_lines(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.invoice.save()
+
+        self.assertEqual(len(self.pdf_updates(queries)), 1)
+        self.receipt.refresh_from_db()
+        self.assertEqual((self.receipt.status, self.receipt.generation), ('pending', 1))
+
+    def test_edit_sale_invalidates_the_receipt(self):
+        sale = self.invoice.items.first()
+
+        self.client.post(reverse('edit_sale', args=[sale.pk]), {
+            'item': self.pen.pk, 'unit_price': '2.00', 'quantity': '2', 'discount': '0', 'total_price': '4.00',
+        })
+
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.status, 'pending')
+
+    def test_failed_document_stops_reloading_until_retried(self):
+        PdfDocument.objects.filter(pk=self.receipt.pk).update(status='failed', error='Broken template')
+        url = reverse('receipt_pdf', args=[self.invoice.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 500)
+        self.assertContains(response, 'Broken template', status_code=500)
+        self.assertNotContains(response, 'window.location.reload', status_code=500)
+
+        self.assertRedirects(self.client.post(url), url, fetch_redirect_response=False)
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.status, 'pending')
+        self.assertContains(self.client.get(url), 'window.location.reload', status_code=202)
+
+    def test_missing_renderer_is_reported_without_reloading(self):
+        with mock.patch('sales_app.pdf.weasyprint', None):
+            response = self.client.get(reverse('daily_invoices_pdf'), {'date': date.today().isoformat()})
+
+        self.assertContains(response, 'WeasyPrint is not installed', status_code=503)
+        self.assertNotContains(response, 'window.location.reload', status_code=503)
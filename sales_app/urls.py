@@ -8,11 +8,13 @@ urlpatterns = [
     path('sales_entry/', views.sales_entry, name='sales_entry'),
     path('manager_dashboard/', views.manager_dashboard, name='manager_dashboard'),
     path('print_daily/', views.print_daily_invoices, name='print_daily_invoices'),
+    path('print_daily/pdf/', views.daily_invoices_pdf, name='daily_invoices_pdf'),
     path('print_search/', views.print_search_results, name='print_search_results'),
     path('edit_sale/<int:sale_id>/', views.edit_sale, name='edit_sale'),
     path('invoice/<int:invoice_id>/', views.invoice_detail, name='invoice_detail'),
     path('edit_invoice/<int:invoice_id>/', views.edit_invoice, name='edit_invoice'),
     path('receipt_print/<int:invoice_id>/', views.invoice_detail, {'print_mode': True}, name='receipt_print'),
+    path('receipt_pdf/<int:invoice_id>/', views.receipt_pdf, name='receipt_pdf'),
     path('api/products/', views.product_autocomplete, name='product_autocomplete'),
     path('products/', views.products_list, name='products'),
     path('products/', views.products_list, name='products_list'),
@@ -1,18 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Sum
+from django.http import FileResponse, JsonResponse, HttpResponse
+from django.db.models import Count, Sum
 from django.utils import timezone
 from django import forms
 from decimal import Decimal
-from django.db import transaction
+from django.db import router, transaction
 from django.contrib import messages
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
 from django.forms import inlineformset_factory
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 
 from .models import Product, Invoice, Sale, AdminLog
-from .forms import InvoiceForm, SaleForm
+from .forms import BaseSaleFormSet, InvoiceForm, SaleForm
+from .catalog import catalog_etag, get_cached_search_results
+from .invoice_search import search_invoices
+from .pagination import keyset_paginate
+from .pdf import get_pdf_document, pdf_rendering_available, retry_pdf_document
+from .printing import stream_invoices_print
+from .search import search_products
+from .signals import sale_lines_changed
+from .stock import (
+    aggregate_quantities, check_stock, deduct_stock, reconcile_stock, record_adjustment, restore_stock,
+    sale_item_quantities,
+)
 from tenants.decorators import tenant_required
 
 
@@ -71,7 +86,9 @@ def add_product(request):
     if request.method == 'POST':
         form = ProductForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic(using=router.db_for_write(Product)):
+                product = form.save()
+                record_adjustment(product, 0, user=request.user, movement_type='RESTOCK', notes='Product created')
             return redirect('products_list')
     else:
         form = ProductForm()
@@ -83,9 +100,12 @@ def add_product(request):
 def edit_product(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     if request.method == 'POST':
+        stock_before = product.stock
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            form.save()
+            with transaction.atomic(using=router.db_for_write(Product)):
+                product = form.save()
+                record_adjustment(product, stock_before, user=request.user, notes='Product edited')
             return redirect('products_list')
     else:
         form = ProductForm(instance=product)
@@ -103,21 +123,43 @@ def delete_product(request, product_id):
 
 
 # === PRODUCT SEARCH API ===
-def product_autocomplete(request):
-    q = request.GET.get('q', '')
-    products = Product.objects.filter(name__icontains=q)[:10]
-    data = [
+# Responses carry an ETag derived from the tenant's catalog version, and
+# results are cached per (tenant, catalog version, query)
+def _autocomplete_results(q):
+    return [
         {
             'id': p.id, 
             'name': p.name, 
             'unit_price': str(p.price),
             'stock': p.stock or 0  # Include stock information
         }
-        for p in products
+        for p in search_products(q, limit=10)
+    ]
+
+
+@condition(etag_func=catalog_etag)
+def product_autocomplete(request):
+    q = request.GET.get('q', '')
+    data = get_cached_search_results('autocomplete', q, _autocomplete_results)
+    return _revalidated(JsonResponse(data, safe=False))
+
+
+def _search_api_results(query):
+    if not query:
+        return []
+    return [
+        {
+            'id': product.id,
+            'text': product.name,
+            'price': str(product.price),
+            'unit_price': str(product.price),  # Keep both for compatibility
+            'stock': product.stock or 0
+        }
+        for product in search_products(query, limit=20)
     ]
-    return JsonResponse(data, safe=False)
 
 
+@condition(etag_func=catalog_etag)
 def product_search_api(request):
     """
     API endpoint for Select2 product search.
@@ -126,114 +168,22 @@ def product_search_api(request):
     """
     if request.method == 'GET':
         query = request.GET.get('q', '').strip()
-        if query:
-            products = Product.objects.filter(name__icontains=query)[:20]
-        else:
-            products = Product.objects.none()
-        data = [
-            {
-                'id': product.id,
-                'text': product.name,
-                'price': str(product.price),
-                'unit_price': str(product.price),  # Keep both for compatibility
-                'stock': product.stock or 0
-            }
-            for product in products
-        ]
-        return JsonResponse(data, safe=False)
+        data = get_cached_search_results('search', query, _search_api_results)
+        return _revalidated(JsonResponse(data, safe=False))
     return JsonResponse([], safe=False)
 
 
-def validate_stock_availability(formset_data):
-    """
-    Validate that all items in the formset have sufficient stock.
-    Returns a list of error messages if validation fails.
-    """
-    errors = []
-    stock_requirements = {}  # {product_name: total_quantity_needed}
-    
-    for form_data in formset_data:
-        if form_data and not form_data.get('DELETE', False):
-            item_name = form_data.get('item')
-            quantity = form_data.get('quantity', 0)
-            
-            if item_name and quantity > 0:
-                if item_name in stock_requirements:
-                    stock_requirements[item_name] += quantity
-                else:
-                    stock_requirements[item_name] = quantity
-    
-    # Check stock availability for each product
-    for item_name, total_needed in stock_requirements.items():
-        try:
-            product = Product.objects.get(name=item_name)
-            if product.stock is None or product.stock < total_needed:
-                available = product.stock or 0
-                errors.append(
-                    f"Insufficient stock for '{item_name}'. "
-                    f"Needed: {total_needed}, Available: {available}"
-                )
-        except Product.DoesNotExist:
-            errors.append(f"Product '{item_name}' not found in inventory.")
-    
-    return errors
-
-
-def deduct_stock_for_sale_items(formset_data, invoice_no):
-    """
-    Deduct stock quantities for all items in the sale.
-    This function should be called within a database transaction.
-    """
-    stock_deductions = {}  # {product_name: total_quantity_to_deduct}
-    
-    # Calculate total deductions needed per product
-    for form_data in formset_data:
-        if form_data and not form_data.get('DELETE', False):
-            item_name = form_data.get('item')
-            quantity = form_data.get('quantity', 0)
-            
-            if item_name and quantity > 0:
-                if item_name in stock_deductions:
-                    stock_deductions[item_name] += quantity
-                else:
-                    stock_deductions[item_name] = quantity
-    
-    # Apply deductions
-    for item_name, total_deduction in stock_deductions.items():
-        try:
-            product = Product.objects.select_for_update().get(name=item_name)
-            product.stock = (product.stock or 0) - total_deduction
-            product.save()
-            
-            print(f"Stock deducted: {item_name} - {total_deduction} units. New stock: {product.stock}")
-            
-        except Product.DoesNotExist:
-            # This shouldn't happen if validation was done properly
-            print(f"WARNING: Product '{item_name}' not found during stock deduction")
-
-
-def restore_stock_for_sale_items(sale_items, invoice_no):
-    """
-    Restore stock quantities for sale items (used when deleting/editing invoices).
-    """
-    for sale_item in sale_items:
-        if sale_item.item and sale_item.quantity:
-            try:
-                product = Product.objects.select_for_update().get(name=sale_item.item)
-                product.stock = (product.stock or 0) + sale_item.quantity
-                product.save()
-                
-                print(f"Stock restored: {sale_item.item} + {sale_item.quantity} units. New stock: {product.stock}")
-                
-            except Product.DoesNotExist:
-                print(f"WARNING: Product '{sale_item.item}' not found during stock restoration")
+def _revalidated(response):
+    # Let browsers keep the response but check the ETag before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 # === SALES ENTRY VIEW ===
 @tenant_required
 @login_required
 def sales_entry(request):
-    SaleFormSet = inlineformset_factory(Invoice, Sale, form=SaleForm, extra=1, can_delete=True)
+    SaleFormSet = inlineformset_factory(Invoice, Sale, form=SaleForm, formset=BaseSaleFormSet, extra=1, can_delete=True)
     
     if request.method == 'POST':
         print("=== DEBUG: Form submitted ===")
@@ -252,60 +202,58 @@ def sales_entry(request):
             print("Formset errors:", formset.errors)
             
         if invoice_form.is_valid() and formset.is_valid():
-            # Validate stock availability before proceeding
             formset_data = [form.cleaned_data for form in formset if form.cleaned_data]
-            stock_errors = validate_stock_availability(formset_data)
             
-            if stock_errors:
-                # Add error messages and re-render form
-                for error in stock_errors:
+            # Use database transaction to ensure data consistency (on the
+            # tenant's database, which holds the invoice and the stock)
+            try:
+                with transaction.atomic(using=router.db_for_write(Invoice)):
+                    # Lock and validate stock for all items at once before
+                    # anything is saved; raises ValidationError listing every
+                    # shortfall
+                    requirements = aggregate_quantities(formset_data)
+                    products = check_stock(requirements)
+                    
+                    print("=== DEBUG: Both forms valid and stock available, saving ===")
+                    invoice = invoice_form.save(commit=False)
+                    invoice.user = request.user
+                    invoice.save()  # Save invoice to get ID and number
+                    
+                    deduct_stock(
+                        requirements, reference=invoice.invoice_no,
+                        user=request.user, products=products,
+                    )
+                    
+                    # Save the formset
+                    formset.instance = invoice
+                    formset.save()
+                    
+                    # Recalculate total from saved items
+                    invoice.total = sum(item.total_price for item in invoice.items.all())
+                    invoice.save()
+                    
+                    messages.success(request, f'Invoice {invoice.invoice_no} saved successfully!')
+                    
+                    if 'save_print' in request.POST:
+                        print("=== DEBUG: Save and Print clicked, rendering receipt ===")
+                        context = {
+                            'invoice': invoice,
+                            'items': invoice.items.all(),
+                        }
+                        return render(request, 'sales_app/receipt_print.html', context)
+                    
+                    return redirect('sales_entry')
+                    
+            except ValidationError as e:
+                # Stock validation failed - nothing was saved or deducted
+                for error in e.messages:
                     messages.error(request, error)
                 print("=== DEBUG: Stock validation failed ===")
-                print("Stock errors:", stock_errors)
-            else:
-                # Use database transaction to ensure data consistency
-                try:
-                    with transaction.atomic():
-                        print("=== DEBUG: Both forms valid and stock available, saving ===")
-                        invoice = invoice_form.save(commit=False)
-                        invoice.user = request.user
-                        
-                        # Calculate total
-                        total = Decimal('0.00')
-                        for form in formset:
-                            if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
-                                item_total = form.cleaned_data.get('total_price') or Decimal('0.00')
-                                total += item_total
-                        
-                        invoice.save()  # Save invoice to get ID
-                        
-                        # Deduct stock before saving formset
-                        deduct_stock_for_sale_items(formset_data, invoice.invoice_no)
-                        
-                        # Save the formset
-                        formset.instance = invoice
-                        formset.save()
-                        
-                        # Recalculate total from saved items
-                        invoice.total = sum(item.total_price for item in invoice.items.all())
-                        invoice.save()
-                        
-                        messages.success(request, f'Invoice {invoice.invoice_no} saved successfully!')
-                        
-                        if 'save_print' in request.POST:
-                            print("=== DEBUG: Save and Print clicked, rendering receipt ===")
-                            context = {
-                                'invoice': invoice,
-                                'items': invoice.items.all(),
-                            }
-                            return render(request, 'sales_app/receipt_print.html', context)
-                        
-                        return redirect('sales_entry')
-                        
-                except Exception as e:
-                    # If anything goes wrong, the transaction will be rolled back
-                    messages.error(request, f'Error saving invoice: {str(e)}')
-                    print(f"=== DEBUG: Error during save: {e} ===")
+                print("Stock errors:", e.messages)
+            except Exception as e:
+                # If anything goes wrong, the transaction will be rolled back
+                messages.error(request, f'Error saving invoice: {str(e)}')
+                print(f"=== DEBUG: Error during save: {e} ===")
         else:
             print("=== DEBUG: Form validation failed ===")
     else:
@@ -323,7 +271,7 @@ def sales_entry(request):
 @login_required
 @user_passes_test(is_manager)
 def manager_dashboard(request):
-    invoices = Invoice.objects.all().order_by('-date_of_sale')
+    invoices = Invoice.objects.select_related('user')
     
     # Get search parameters
     start_date = request.GET.get('start_date')
@@ -335,29 +283,12 @@ def manager_dashboard(request):
     has_search_params = any([start_date, end_date, customer_name, invoice_no])
     
     if has_search_params:
-        # Build OR conditions using Q objects
-        from django.db.models import Q
-        search_conditions = Q()
-        
-        # Date range search
-        if start_date and end_date:
-            search_conditions |= Q(date_of_sale__gte=start_date, date_of_sale__lte=end_date)
-        elif start_date:
-            search_conditions |= Q(date_of_sale__gte=start_date)
-        elif end_date:
-            search_conditions |= Q(date_of_sale__lte=end_date)
-        
-        # Customer name search (case-insensitive partial match)
-        if customer_name:
-            search_conditions |= Q(customer_name__icontains=customer_name)
-        
-        # Invoice number search (case-insensitive partial match)
-        if invoice_no:
-            search_conditions |= Q(invoice_no__icontains=invoice_no)
-        
-        # Apply the OR search conditions
-        if search_conditions:
-            invoices = invoices.filter(search_conditions)
+        # OR search over the date range, customer name and invoice number,
+        # each answered by an index (see invoice_search.py)
+        invoices = search_invoices(
+            invoices, start_date, end_date,
+            customer_name=customer_name, invoice_no=invoice_no,
+        )
     else:
         # Default behavior: show today's invoices if no search parameters
         today = timezone.now().date()
@@ -367,11 +298,14 @@ def manager_dashboard(request):
     if request.method == 'POST' and 'delete_invoice_id' in request.POST:
         invoice_id = request.POST.get('delete_invoice_id')
         try:
-            with transaction.atomic():
+            with transaction.atomic(using=router.db_for_write(Invoice)):
                 invoice = Invoice.objects.get(id=invoice_id)
                 
                 # Restore stock for all items in the invoice
-                restore_stock_for_sale_items(invoice.items.all(), invoice.invoice_no)
+                restore_stock(
+                    sale_item_quantities(invoice.items.all()),
+                    reference=invoice.invoice_no, user=request.user,
+                )
                 
                 # Log the deletion
                 AdminLog.objects.create(
@@ -390,10 +324,22 @@ def manager_dashboard(request):
             
         return redirect('manager_dashboard')
 
-    total_sales = invoices.aggregate(Sum('total'))['total__sum'] or 0
+    # Count and total of all matches in one query; rows are fetched one
+    # keyset page at a time
+    summary = invoices.aggregate(invoice_count=Count('id'), total_sales=Sum('total'))
+    page = keyset_paginate(
+        invoices,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=getattr(settings, 'MANAGER_DASHBOARD_PAGE_SIZE', 50),
+    )
     return render(request, 'sales_app/manager_dashboard.html', {
-        'invoices': invoices,
-        'total_sales': total_sales,
+        'invoices': page.object_list,
+        'page': page,
+        'next_page_query': _page_query(request, after=page.next_cursor),
+        'previous_page_query': _page_query(request, before=page.previous_cursor),
+        'invoice_count': summary['invoice_count'],
+        'total_sales': summary['total_sales'] or 0,
         'search_params': {
             'start_date': start_date,
             'end_date': end_date,
@@ -403,31 +349,38 @@ def manager_dashboard(request):
     })
 
 
+def _page_query(request, **cursor):
+    """Query string for another keyset page, keeping the search parameters"""
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params.update({key: value for key, value in cursor.items() if value})
+    return params.urlencode()
+
+
+def _print_date(request):
+    """Date of a daily printout from ?date=YYYY-MM-DD, defaulting to today"""
+    date_str = request.GET.get('date')
+    if not date_str:
+        # Default to today
+        return timezone.now().date()
+    try:
+        from datetime import datetime
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return timezone.now().date()
+
+
 @login_required
 @user_passes_test(is_manager)
 def print_daily_invoices(request):
     """Print all invoices for a specific date"""
-    date_str = request.GET.get('date')
-    if not date_str:
-        # Default to today
-        print_date = timezone.now().date()
-    else:
-        try:
-            from datetime import datetime
-            print_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
-            print_date = timezone.now().date()
-    
-    invoices = Invoice.objects.filter(date_of_sale=print_date).prefetch_related('items').order_by('invoice_no')
-    total_sales = invoices.aggregate(Sum('total'))['total__sum'] or 0
-    
-    context = {
-        'invoices': invoices,
-        'total_sales': total_sales,
+    print_date = _print_date(request)
+    invoices = Invoice.objects.filter(date_of_sale=print_date).order_by('invoice_no')
+    return stream_invoices_print(request, invoices, {
         'print_date': print_date,
         'print_type': 'daily'
-    }
-    return render(request, 'sales_app/invoices_print.html', context)
+    })
 
 
 @login_required
@@ -440,40 +393,22 @@ def print_search_results(request):
     customer_name = request.GET.get('customer_name', '').strip()
     invoice_no = request.GET.get('invoice_no', '').strip()
     
-    invoices = Invoice.objects.all().prefetch_related('items').order_by('-date_of_sale')
+    invoices = Invoice.objects.all().order_by('-date_of_sale')
     
     # Apply the same search logic as manager_dashboard
     has_search_params = any([start_date, end_date, customer_name, invoice_no])
     
     if has_search_params:
-        from django.db.models import Q
-        search_conditions = Q()
-        
-        if start_date and end_date:
-            search_conditions |= Q(date_of_sale__gte=start_date, date_of_sale__lte=end_date)
-        elif start_date:
-            search_conditions |= Q(date_of_sale__gte=start_date)
-        elif end_date:
-            search_conditions |= Q(date_of_sale__lte=end_date)
-        
-        if customer_name:
-            search_conditions |= Q(customer_name__icontains=customer_name)
-        
-        if invoice_no:
-            search_conditions |= Q(invoice_no__icontains=invoice_no)
-        
-        if search_conditions:
-            invoices = invoices.filter(search_conditions)
+        invoices = search_invoices(
+            invoices, start_date, end_date,
+            customer_name=customer_name, invoice_no=invoice_no,
+        )
     else:
         # If no search params, show today's invoices
         today = timezone.now().date()
         invoices = invoices.filter(date_of_sale=today)
     
-    total_sales = invoices.aggregate(Sum('total'))['total__sum'] or 0
-    
-    context = {
-        'invoices': invoices,
-        'total_sales': total_sales,
+    return stream_invoices_print(request, invoices, {
         'search_params': {
             'start_date': start_date,
             'end_date': end_date,
@@ -481,8 +416,7 @@ def print_search_results(request):
             'invoice_no': invoice_no,
         },
         'print_type': 'search'
-    }
-    return render(request, 'sales_app/invoices_print.html', context)
+    })
 
 
 @login_required
@@ -501,11 +435,50 @@ def invoice_detail(request, invoice_id, print_mode=False):
     })
 
 
+def _pdf_response(request, document, filename):
+    """
+    Serve a ready PDF document, or a page that waits for the worker.
+
+    The page only reloads itself while the document is queued: it reports
+    a failed render (POST queues it again) and a process that cannot render.
+    """
+    if document.status == 'ready':
+        return FileResponse(
+            default_storage.open(document.file_path), content_type='application/pdf', filename=filename,
+        )
+    if not pdf_rendering_available():
+        return render(request, 'sales_app/pdf_pending.html', {'document': document, 'unavailable': True}, status=503)
+    if document.status == 'failed':
+        if request.method == 'POST':
+            retry_pdf_document(document)
+            return redirect(request.get_full_path())
+        return render(request, 'sales_app/pdf_pending.html', {'document': document}, status=500)
+    return render(request, 'sales_app/pdf_pending.html', {'document': document}, status=202)
+
+
+@login_required
+@user_passes_test(is_manager)
+def receipt_pdf(request, invoice_id):
+    """Receipt of an invoice as PDF, rendered by the PDF worker"""
+    invoice = get_object_or_404(Invoice, id=invoice_id)
+    document = get_pdf_document('receipt', invoice=invoice)
+    return _pdf_response(request, document, f'receipt-{invoice.invoice_no or invoice.pk}.pdf')
+
+
+@login_required
+@user_passes_test(is_manager)
+def daily_invoices_pdf(request):
+    """Daily invoices report as PDF, rendered by the PDF worker"""
+    print_date = _print_date(request)
+    document = get_pdf_document('daily_report', report_date=print_date)
+    return _pdf_response(request, document, f'daily-invoices-{print_date:%Y-%m-%d}.pdf')
+
+
 @login_required
 @user_passes_test(is_manager)
 def edit_invoice(request, invoice_id):
     invoice = get_object_or_404(Invoice, id=invoice_id)
-    SaleFormSet = inlineformset_factory(Invoice, Sale, form=SaleForm, extra=0, can_delete=True)
+    SaleFormSet = inlineformset_factory(Invoice, Sale, form=SaleForm, formset=BaseSaleFormSet, extra=0, can_delete=True)
     
     if request.method == 'POST':
         form = InvoiceForm(request.POST, instance=invoice)
@@ -513,29 +486,16 @@ def edit_invoice(request, invoice_id):
         
         if form.is_valid() and formset.is_valid():
             try:
-                with transaction.atomic():
-                    # First, restore stock for the original invoice items
+                with transaction.atomic(using=router.db_for_write(Invoice)):
+                    # Lock and update only products whose net quantity changed;
+                    # raises ValidationError if an increase is not in stock
                     original_items = list(invoice.items.all())
-                    restore_stock_for_sale_items(original_items, invoice.invoice_no)
-                    
-                    # Validate stock for new/updated items
                     formset_data = [form.cleaned_data for form in formset if form.cleaned_data]
-                    stock_errors = validate_stock_availability(formset_data)
-                    
-                    if stock_errors:
-                        # Restore the original stock deductions if validation fails
-                        for sale_item in original_items:
-                            if sale_item.item and sale_item.quantity:
-                                try:
-                                    product = Product.objects.select_for_update().get(name=sale_item.item)
-                                    product.stock = (product.stock or 0) - sale_item.quantity
-                                    product.save()
-                                except Product.DoesNotExist:
-                                    pass
-                        
-                        for error in stock_errors:
-                            messages.error(request, error)
-                        raise ValidationError("Stock validation failed")
+                    reconcile_stock(
+                        sale_item_quantities(original_items),
+                        aggregate_quantities(formset_data),
+                        reference=invoice.invoice_no, user=request.user,
+                    )
                     
                     # Save the updated invoice and formset
                     invoice = form.save(commit=False)
@@ -543,9 +503,6 @@ def edit_invoice(request, invoice_id):
                     invoice.save()
                     formset.save()
                     
-                    # Deduct stock for the new/updated items
-                    deduct_stock_for_sale_items(formset_data, invoice.invoice_no)
-                    
                     # Recalculate total after saving
                     items_total = sum(item.total_price or 0 for item in invoice.items.all())
                     invoice_discount = invoice.discount or 0
@@ -555,9 +512,9 @@ def edit_invoice(request, invoice_id):
                     messages.success(request, 'Invoice updated successfully!')
                     return redirect('manager_dashboard')
                     
-            except ValidationError:
-                # Error messages already added above
-                pass
+            except ValidationError as e:
+                for error in e.messages:
+                    messages.error(request, error)
             except Exception as e:
                 messages.error(request, f'Error updating invoice: {str(e)}')
     else:
@@ -579,6 +536,8 @@ def edit_sale(request, sale_id):
         form = SaleForm(request.POST, instance=sale)
         if form.is_valid():
             form.save()
+            if sale.invoice_id:
+                sale_lines_changed.send(sender=Invoice, invoice=sale.invoice, using=router.db_for_write(Sale))
             return redirect('manager_dashboard')
     else:
         form = SaleForm(instance=sale)
@@ -3,6 +3,11 @@ ASGI config for sales_management_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+TenantMiddleware is async-capable and keeps the current tenant in a context
+variable, so the app can be served from an async worker, e.g.:
+
+    gunicorn sales_management_project.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
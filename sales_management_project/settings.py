@@ -82,6 +82,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'sales_management_project.wsgi.application'
+ASGI_APPLICATION = 'sales_management_project.asgi.application'
 
 # =============================================================================
 # DATABASE CONFIGURATION
@@ -117,6 +118,38 @@ TENANT_DATABASE_TEMPLATE = {
 # No default tenant - all access must be through valid tenant subdomains
 DEFAULT_TENANT_SUBDOMAIN = None
 
+# In-process subdomain -> tenant cache used by TenantMiddleware
+TENANT_CACHE_TTL = config('TENANT_CACHE_TTL', default=300, cast=int)  # seconds, 0 disables
+TENANT_CACHE_MAX_SIZE = config('TENANT_CACHE_MAX_SIZE', default=256, cast=int)
+TENANT_CACHE_VERSION_CHECK_INTERVAL = config('TENANT_CACHE_VERSION_CHECK_INTERVAL', default=5, cast=int)
+
+# Tenant connection pool: cap on recently used tenant databases per process
+# (each thread keeps at most one connection per tenant in this set)
+TENANT_MAX_OPEN_CONNECTIONS = config('TENANT_MAX_OPEN_CONNECTIONS', default=20, cast=int)
+TENANT_CONNECTION_IDLE_TIMEOUT = config('TENANT_CONNECTION_IDLE_TIMEOUT', default=300, cast=int)  # seconds
+
+# New tenant databases are cloned from this pre-migrated template database
+TENANT_TEMPLATE_DATABASE = config('TENANT_TEMPLATE_DATABASE', default='sales_template')
+TENANT_TEMPLATE_CLONING = config('TENANT_TEMPLATE_CLONING', default=True, cast=bool)
+
+# Product autocomplete: optional in-process prefix index per tenant, rebuilt
+# when the tenant's catalog changes (and at least every TTL seconds)
+PRODUCT_SEARCH_PREFIX_INDEX = config('PRODUCT_SEARCH_PREFIX_INDEX', default=False, cast=bool)
+PRODUCT_SEARCH_PREFIX_INDEX_TTL = config('PRODUCT_SEARCH_PREFIX_INDEX_TTL', default=300, cast=int)  # seconds, 0 disables
+
+# Cached product API results; stale entries are also skipped as soon as the
+# tenant's catalog version changes
+PRODUCT_SEARCH_CACHE_TTL = config('PRODUCT_SEARCH_CACHE_TTL', default=300, cast=int)  # seconds
+
+# Invoices per page on the manager dashboard (keyset pagination)
+MANAGER_DASHBOARD_PAGE_SIZE = config('MANAGER_DASHBOARD_PAGE_SIZE', default=50, cast=int)
+
+# Invoices rendered per chunk of the streamed daily/search printouts
+INVOICE_PRINT_CHUNK_SIZE = config('INVOICE_PRINT_CHUNK_SIZE', default=100, cast=int)
+
+# Rows per page of the outstanding invoices (revenue tracking) and the AR aging report
+ACCOUNTING_OUTSTANDING_PAGE_SIZE = config('ACCOUNTING_OUTSTANDING_PAGE_SIZE', default=50, cast=int)
+
 # Log active DB (remove or disable in production if needed)
 print(f"[ENV DEBUG] Active DB URL: {database_url}", file=sys.stderr)
 
@@ -5,3 +5,7 @@ class TenantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tenants'
     verbose_name = 'Tenant Management'
+
+    def ready(self):
+        # Register signal handlers that invalidate tenant caches
+        from . import signals  # noqa: F401
@@ -0,0 +1,170 @@
+"""
+In-process cache for resolving subdomains to Tenant instances.
+
+TenantMiddleware resolves the tenant on every request. Keeping recently used
+tenants in memory avoids a round trip to the shared database for hot tenants.
+Entries expire after TENANT_CACHE_TTL seconds, the cache holds at most
+TENANT_CACHE_MAX_SIZE tenants, and every process drops its entries when the
+Tenant table changes (see get_tenant_cache_version).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+
+def get_tenant_cache_version():
+    """
+    Get the version of the Tenant table in the shared database.
+
+    Tenant.save() sets updated_at, so creating, changing or deleting a tenant
+    changes the number of tenants or the latest updated_at. Code updating
+    tenants with QuerySet.update() must set updated_at itself.
+
+    Returns:
+        tuple: (number of tenants, latest updated_at), or None if the table
+        cannot be read yet
+    """
+    from .models import Tenant
+
+    try:
+        version = Tenant.objects.using('default').aggregate(count=Count('id'), changed=Max('updated_at'))
+    except DatabaseError:
+        return None
+    return version['count'], version['changed']
+
+
+class SharedVersionWatcher:
+    """
+    Detects changes of the Tenant table made by any process.
+
+    The table is queried at most once every ``interval`` seconds, so hot
+    paths pay for the aggregate only occasionally.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = (
+            interval if interval is not None
+            else getattr(settings, 'TENANT_CACHE_VERSION_CHECK_INTERVAL', 5)
+        )
+        self._version = None
+        self._checked_at = None
+
+    def changed(self):
+        """
+        Check whether the Tenant table changed since the last check.
+
+        Returns:
+            bool: True if another process (or this one) changed a tenant.
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.interval:
+            return False
+        version = get_tenant_cache_version()
+        first_check = self._checked_at is None
+        self._checked_at = now
+        if version != self._version:
+            self._version = version
+            return not first_check
+        return False
+
+
+class TenantCache:
+    """
+    Bounded, TTL-based LRU mapping of subdomain -> active Tenant.
+
+    The Tenant table's version is checked at most once every
+    TENANT_CACHE_VERSION_CHECK_INTERVAL seconds, so a change made in another
+    process is picked up within that interval. Changes made in this process
+    are picked up immediately through clear().
+    """
+
+    def __init__(self, ttl=None, max_size=None, version_check_interval=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TENANT_CACHE_TTL', 300)
+        self.max_size = max_size if max_size is not None else getattr(settings, 'TENANT_CACHE_MAX_SIZE', 256)
+        self._watcher = SharedVersionWatcher(version_check_interval)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subdomain):
+        """
+        Resolve an active tenant by subdomain, using the cache when possible.
+
+        Args:
+            subdomain: Tenant subdomain
+
+        Returns:
+            Tenant: The active tenant, or None if no active tenant matches.
+        """
+        if not self.ttl or not self.max_size:
+            return self._load(subdomain)
+
+        now = time.monotonic()
+        with self._lock:
+            if self._watcher.changed():
+                self._entries.clear()
+
+            entry = self._entries.get(subdomain)
+            if entry is not None:
+                tenant, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(subdomain)
+                    return tenant
+                del self._entries[subdomain]
+
+        tenant = self._load(subdomain)
+        if tenant is not None:
+            with self._lock:
+                self._entries[subdomain] = (tenant, now + self.ttl)
+                self._entries.move_to_end(subdomain)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return tenant
+
+    def invalidate(self, subdomain):
+        """Drop a single subdomain from this process's cache"""
+        with self._lock:
+            self._entries.pop(subdomain, None)
+
+    def clear(self):
+        """Drop every cached tenant in this process"""
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, subdomain):
+        from .models import Tenant
+
+        try:
+            return Tenant.objects.get(subdomain=subdomain, is_active=True)
+        except Tenant.DoesNotExist:
+            return None
+
+
+tenant_cache = TenantCache()
+
+
+def get_tenant_by_subdomain(subdomain):
+    """
+    Get an active tenant by subdomain through the process-wide cache.
+
+    Args:
+        subdomain: Tenant subdomain
+
+    Returns:
+        Tenant: The active tenant, or None if not found or inactive.
+    """
+    return tenant_cache.get(subdomain)
+
+
+def invalidate_tenant_cache():
+    """
+    Clear this process's tenant cache.
+
+    Other processes notice the change of the Tenant table within
+    TENANT_CACHE_VERSION_CHECK_INTERVAL seconds.
+    """
+    tenant_cache.clear()
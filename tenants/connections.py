@@ -0,0 +1,144 @@
+"""
+Bounded management of tenant database connections.
+
+Django keeps one connection per alias per thread, and with CONN_MAX_AGE each
+of them stays open long after the request that used it. With many tenants a
+process ends up holding a connection to every tenant it has ever served.
+
+TenantConnectionManager keeps a process-wide LRU of tenant aliases capped at
+TENANT_MAX_OPEN_CONNECTIONS. When a request finishes, the serving thread
+closes its connections to aliases that were evicted from the LRU or have been
+idle for longer than TENANT_CONNECTION_IDLE_TIMEOUT seconds, so the number of
+open connections follows the set of active tenants instead of all tenants.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class TenantConnectionManager:
+    """
+    Process-wide LRU of tenant database aliases.
+
+    Connections belong to the thread that opened them, so eviction never
+    closes another thread's connection directly; each thread closes its own
+    evicted or idle connections in release(), which runs at the end of every
+    request.
+    """
+
+    def __init__(self, max_connections=None, idle_timeout=None):
+        self.max_connections = (
+            max_connections if max_connections is not None
+            else getattr(settings, 'TENANT_MAX_OPEN_CONNECTIONS', 20)
+        )
+        self.idle_timeout = (
+            idle_timeout if idle_timeout is not None
+            else getattr(settings, 'TENANT_CONNECTION_IDLE_TIMEOUT', 300)
+        )
+        self._last_used = OrderedDict()  # alias -> monotonic time of last use
+        self._open = {}  # alias -> set of thread idents holding a connection
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'closed': 0}
+
+    def touch(self, alias):
+        """
+        Mark a tenant alias as used by the current request.
+
+        Evicts the least recently used aliases if the cap is exceeded.
+
+        Args:
+            alias: Tenant database alias
+        """
+        if alias == DEFAULT_DB_ALIAS:
+            return
+
+        evicted = []
+        with self._lock:
+            if alias in self._last_used:
+                self._counters['hits'] += 1
+                self._last_used.move_to_end(alias)
+            else:
+                self._counters['misses'] += 1
+            self._last_used[alias] = time.monotonic()
+
+            while self.max_connections and len(self._last_used) > self.max_connections:
+                old_alias, _ = self._last_used.popitem(last=False)
+                self._counters['evictions'] += 1
+                evicted.append(old_alias)
+
+        # Close this thread's connections right away; other threads close
+        # theirs when their current request finishes.
+        for old_alias in evicted:
+            self._close(old_alias)
+
+    def release(self):
+        """
+        Close this thread's connections to evicted or idle tenant aliases.
+
+        Called when a request finishes.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = {
+                alias for alias, last_used in self._last_used.items()
+                if self.idle_timeout and now - last_used > self.idle_timeout
+            }
+            for alias in stale:
+                del self._last_used[alias]
+                self._counters['evictions'] += 1
+            active = set(self._last_used)
+
+        for conn in connections.all(initialized_only=True):
+            if conn.alias == DEFAULT_DB_ALIAS:
+                continue
+            if conn.alias not in active:
+                self._close(conn.alias)
+            elif conn.connection is not None:
+                self._mark_open(conn.alias)
+
+    def _close(self, alias):
+        thread_id = threading.get_ident()
+        conn = connections[alias] if alias in connections else None
+        if conn is not None and conn.connection is not None:
+            conn.close()
+            with self._lock:
+                self._counters['closed'] += 1
+        with self._lock:
+            holders = self._open.get(alias)
+            if holders is not None:
+                holders.discard(thread_id)
+                if not holders:
+                    del self._open[alias]
+
+    def _mark_open(self, alias):
+        with self._lock:
+            self._open.setdefault(alias, set()).add(threading.get_ident())
+
+    def stats(self):
+        """
+        Get connection statistics for this process.
+
+        Returns:
+            dict: Cap, tracked aliases, open connections (as of the last
+            finished request of each thread) and hit/miss/eviction counters.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'max_connections': self.max_connections,
+                'idle_timeout': self.idle_timeout,
+                'active_aliases': len(self._last_used),
+                'open_connections': sum(len(holders) for holders in self._open.values()),
+                'idle_seconds': {
+                    alias: round(now - last_used, 1)
+                    for alias, last_used in self._last_used.items()
+                },
+                **self._counters,
+            }
+
+
+tenant_connections = TenantConnectionManager()
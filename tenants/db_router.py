@@ -1,5 +1,7 @@
 from django.conf import settings
 from .middleware import get_current_tenant
+from .registry import tenant_databases
+from .provisioning import is_template_database
 
 
 class TenantDatabaseRouter:
@@ -30,6 +32,11 @@ class TenantDatabaseRouter:
         # For tenant-specific models, use tenant database
         tenant = get_current_tenant()
         if tenant:
+            if tenant.database_name not in settings.DATABASES:
+                # Contexts set outside TenantMiddleware (commands, scripts)
+                # load the alias from the in-memory tenant database registry
+                from .utils import ensure_tenant_database_loaded
+                ensure_tenant_database_loaded(tenant)
             return tenant.database_name
         
         # Fallback to default database
@@ -71,9 +78,9 @@ class TenantDatabaseRouter:
             # Allow migration to default for initial setup
             return True
         
-        # Allow migration to tenant databases (check if db is a tenant database)
-        from .utils import is_tenant_database
-        if is_tenant_database(db):
+        # Allow migration to tenant databases (in-memory registry lookup)
+        # and to the template database new tenants are cloned from
+        if tenant_databases.is_tenant_database(db) or is_template_database(db):
             return True
         
         return False
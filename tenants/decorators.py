@@ -1,4 +1,5 @@
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.http import HttpResponse
 from tenants.middleware import get_current_tenant
 
@@ -7,24 +8,36 @@ def tenant_required(view_func):
     """
     Decorator to require a valid tenant for a view.
     Redirects to tenant selection if no tenant is found.
+    Works with both sync and async views.
     """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not get_current_tenant():
+                return _tenant_required_response()
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+    
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        tenant = get_current_tenant()
-        if not tenant:
-            return HttpResponse(
-                """
-                <html>
-                <head><title>Tenant Required</title></head>
-                <body>
-                    <h1>Tenant Access Required</h1>
-                    <p>This application requires access through a valid tenant subdomain.</p>
-                    <p><a href="http://localhost:8000">← Select a tenant</a></p>
-                </body>
-                </html>
-                """,
-                status=400,
-                content_type='text/html'
-            )
+        if not get_current_tenant():
+            return _tenant_required_response()
         return view_func(request, *args, **kwargs)
     return wrapper
+
+
+def _tenant_required_response():
+    return HttpResponse(
+        """
+        <html>
+        <head><title>Tenant Required</title></head>
+        <body>
+            <h1>Tenant Access Required</h1>
+            <p>This application requires access through a valid tenant subdomain.</p>
+            <p><a href="http://localhost:8000">← Select a tenant</a></p>
+        </body>
+        </html>
+        """,
+        status=400,
+        content_type='text/html'
+    )
@@ -1,11 +1,42 @@
+import multiprocessing
+import queue
+import time
+
 from django.core.management.base import BaseCommand, CommandError
 from django.core.management import call_command
-from tenants.models import Tenant
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Models are imported inside the functions: with the 'spawn' start method a
+# worker process imports this module before Django is set up
+
+
+def _migrate_worker(tenant_id, app_filter, results):
+    """Run migrate for one tenant in a child process and report the outcome"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # 'spawn' start method (e.g. Windows): Django is not set up yet
+        django.setup()
+    from tenants.models import Tenant
+    from tenants.utils import ensure_tenant_database_loaded
+
+    started = time.monotonic()
+    try:
+        tenant = Tenant.objects.get(pk=tenant_id)
+        ensure_tenant_database_loaded(tenant)
+        args = [app_filter] if app_filter else []
+        call_command('migrate', *args, database=tenant.database_name, verbosity=0, interactive=False)
+        results.put((tenant_id, 'migrated', '', time.monotonic() - started))
+    except Exception as e:
+        results.put((tenant_id, 'failed', str(e), time.monotonic() - started))
+    finally:
+        connections.close_all()
 
 
 class Command(BaseCommand):
     help = 'Migrate all tenant databases'
-    
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--tenant',
@@ -17,47 +48,172 @@ class Command(BaseCommand):
             type=str,
             help='Migrate specific app only'
         )
-    
+        parser.add_argument(
+            '--jobs', '-j',
+            type=int,
+            default=1,
+            help='Number of tenants to migrate in parallel (separate processes)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=0,
+            help='Per-tenant timeout in seconds (0 = no timeout)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the pending migrations per tenant without applying them'
+        )
+
     def handle(self, *args, **options):
+        from tenants.models import Tenant
+
         tenant_filter = options.get('tenant')
         app_filter = options.get('app')
-        
+        jobs = max(1, options['jobs'])
+        timeout = options['timeout']
+
         if tenant_filter:
             # Migrate specific tenant
             try:
-                tenant = Tenant.objects.get(subdomain=tenant_filter)
-                self._migrate_tenant(tenant, app_filter)
+                tenants = [Tenant.objects.get(subdomain=tenant_filter)]
             except Tenant.DoesNotExist:
                 raise CommandError(f'Tenant with subdomain "{tenant_filter}" not found')
         else:
             # Migrate all tenants
-            tenants = Tenant.objects.filter(is_active=True)
-            
-            if not tenants.exists():
+            tenants = list(Tenant.objects.filter(is_active=True))
+
+            if not tenants:
                 self.stdout.write('No active tenants found.')
                 return
-            
-            self.stdout.write(f'Migrating {tenants.count()} tenant(s)...')
-            
-            for tenant in tenants:
-                self._migrate_tenant(tenant, app_filter)
-        
-        self.stdout.write(self.style.SUCCESS('All tenant migrations completed successfully!'))
-    
+
+        self.stdout.write(f'Checking migration state of {len(tenants)} tenant(s)...')
+
+        results = {}  # tenant.pk -> (status, detail, seconds)
+        pending = []
+        for tenant in tenants:
+            try:
+                plan = self._migration_plan(tenant, app_filter)
+            except Exception as e:
+                results[tenant.pk] = ('failed', f'Could not read migration state: {e}', 0.0)
+                continue
+
+            if not plan:
+                results[tenant.pk] = ('up to date', '', 0.0)
+            elif options['dry_run']:
+                names = ', '.join(f'{m.app_label}.{m.name}' for m, backwards in plan)
+                results[tenant.pk] = ('pending', f'{len(plan)} migration(s): {names}', 0.0)
+            else:
+                pending.append(tenant)
+
+        if pending:
+            self.stdout.write(f'Migrating {len(pending)} tenant(s) with {min(jobs, len(pending))} job(s)...')
+            started = time.monotonic()
+            if jobs == 1 and not timeout:
+                for tenant in pending:
+                    results[tenant.pk] = self._migrate_tenant(tenant, app_filter)
+            else:
+                results.update(self._migrate_in_processes(pending, app_filter, jobs, timeout))
+            self.stdout.write(f'Finished in {time.monotonic() - started:.1f}s')
+
+        self._write_summary(tenants, results, options['dry_run'])
+
+    def _migration_plan(self, tenant, app_filter=None):
+        """Return the migrations that still have to be applied to a tenant database"""
+        from tenants.utils import ensure_tenant_database_loaded
+
+        ensure_tenant_database_loaded(tenant)
+        executor = MigrationExecutor(connections[tenant.database_name])
+        targets = executor.loader.graph.leaf_nodes()
+        if app_filter:
+            targets = [key for key in targets if key[0] == app_filter]
+            if not targets:
+                raise CommandError(f'App "{app_filter}" has no migrations')
+        return executor.migration_plan(targets)
+
     def _migrate_tenant(self, tenant, app_filter=None):
-        """Migrate a specific tenant database"""
+        """Migrate a specific tenant database in this process"""
         self.stdout.write(f'Migrating tenant: {tenant.name} ({tenant.subdomain})...')
-        
+
+        started = time.monotonic()
         try:
             if app_filter:
                 call_command('migrate', app_filter, database=tenant.database_name, verbosity=1)
             else:
                 call_command('migrate', database=tenant.database_name, verbosity=1)
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'✅ Successfully migrated {tenant.subdomain}')
-            )
+            return ('migrated', '', time.monotonic() - started)
         except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'❌ Failed to migrate {tenant.subdomain}: {str(e)}')
-            )
+            return ('failed', str(e), time.monotonic() - started)
+
+    def _migrate_in_processes(self, tenants, app_filter, jobs, timeout):
+        """Migrate tenants in up to `jobs` child processes, enforcing the per-tenant timeout"""
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        result_queue = context.Queue()
+
+        # Children must open their own connections, never reuse the parent's sockets
+        connections.close_all()
+
+        waiting = list(tenants)
+        running = {}  # tenant.pk -> (process, started_at)
+        results = {}
+
+        while waiting or running:
+            while waiting and len(running) < jobs:
+                tenant = waiting.pop(0)
+                process = context.Process(
+                    target=_migrate_worker,
+                    args=(tenant.pk, app_filter, result_queue),
+                    name=f'migrate-{tenant.subdomain}',
+                )
+                process.start()
+                running[tenant.pk] = (process, time.monotonic())
+                self.stdout.write(f'Started: {tenant.subdomain}')
+
+            try:
+                tenant_id, status, detail, seconds = result_queue.get(timeout=0.2)
+                if tenant_id in running:  # ignore late results of timed-out workers
+                    results[tenant_id] = (status, detail, seconds)
+                    process, _ = running.pop(tenant_id)
+                    process.join()
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for tenant_id, (process, started_at) in list(running.items()):
+                if timeout and now - started_at > timeout:
+                    process.terminate()
+                    process.join()
+                    results[tenant_id] = ('timed out', f'Exceeded {timeout}s', now - started_at)
+                    del running[tenant_id]
+                elif not process.is_alive() and process.exitcode not in (0, None):
+                    results[tenant_id] = ('failed', f'Worker exited with code {process.exitcode}', now - started_at)
+                    del running[tenant_id]
+
+        return results
+
+    def _write_summary(self, tenants, results, dry_run=False):
+        self.stdout.write('')
+        self.stdout.write(f'{"Tenant":<30} {"Status":<12} {"Time":>8}')
+        self.stdout.write('-' * 52)
+
+        failures = 0
+        for tenant in tenants:
+            status, detail, seconds = results[tenant.pk]
+            line = f'{tenant.subdomain:<30} {status:<12} {seconds:>7.1f}s'
+            if status in ('failed', 'timed out'):
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'❌ {line}  {detail}'))
+            elif status == 'pending':
+                self.stdout.write(f'   {line}  {detail}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {line}'))
+
+        self.stdout.write('-' * 52)
+        if failures:
+            self.stdout.write(self.style.ERROR(f'{failures} tenant migration(s) failed.'))
+        elif dry_run:
+            self.stdout.write('Dry run - no migrations were applied.')
+        else:
+            self.stdout.write(self.style.SUCCESS('All tenant migrations completed successfully!'))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tenants.provisioning import (
+    POSTGRESQL_ENGINE, SQLITE_ENGINE, get_template_database_name, refresh_template_database,
+)
+
+
+class Command(BaseCommand):
+    help = 'Create or migrate the template database new tenants are cloned from'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engine',
+            choices=['sqlite', 'postgresql'],
+            help='Template engine to refresh (defaults to the engine of the default database)'
+        )
+    
+    def handle(self, *args, **options):
+        engine = options.get('engine')
+        if engine is None:
+            engine = 'postgresql' if 'postgresql' in settings.DATABASES['default']['ENGINE'] else 'sqlite'
+        engine_path = POSTGRESQL_ENGINE if engine == 'postgresql' else SQLITE_ENGINE
+        
+        self.stdout.write(f'Refreshing {engine} template database "{get_template_database_name()}"...')
+        applied = refresh_template_database(engine_path, verbosity=options['verbosity'])
+        
+        if applied:
+            self.stdout.write(self.style.SUCCESS(f'✅ Applied {applied} migration(s) to the template'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Template database is up to date'))
@@ -1,12 +1,14 @@
 from django.http import Http404, HttpResponse
 from django.shortcuts import render
 from django.conf import settings
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from .models import Tenant
-import threading
+from .cache import get_tenant_by_subdomain
+from contextvars import ContextVar
 import sys
 
-# Thread-local storage for current tenant
-_thread_local = threading.local()
+# Context-local storage for current tenant (safe for threads and asyncio tasks)
+_current_tenant = ContextVar('current_tenant', default=None)
 
 
 class TenantMiddleware:
@@ -19,12 +21,58 @@ class TenantMiddleware:
     - localhost:8000 or 127.0.0.1:8000 -> shows tenant selection page
     
     All application functionality requires a valid tenant subdomain.
+    
+    Works under both WSGI and ASGI. The tenant context is reset once the
+    response has been produced so it never leaks into the next request
+    served by the same thread or task.
     """
     
+    sync_capable = True
+    async_capable = True
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        
+        token = _current_tenant.set(None)
+        try:
+            response = self.process_tenant(request)
+            if response is None:
+                response = self.get_response(request)
+            return response
+        finally:
+            _current_tenant.reset(token)
+    
+    async def __acall__(self, request):
+        token = _current_tenant.set(None)
+        try:
+            # Tenant resolution may hit the database, so run it in a thread
+            # and hand the resolved tenant back to this task explicitly.
+            response, tenant = await sync_to_async(self._process_tenant_in_thread)(request)
+            set_current_tenant(tenant)
+            if response is None:
+                response = await self.get_response(request)
+            return response
+        finally:
+            _current_tenant.reset(token)
+    
+    def _process_tenant_in_thread(self, request):
+        response = self.process_tenant(request)
+        return response, get_current_tenant()
+    
+    def process_tenant(self, request):
+        """
+        Resolve the tenant for this request and set it as the current tenant.
+        
+        Returns:
+            HttpResponse to short-circuit the request (tenant selection or
+            error page), or None to continue to the view.
+        """
         # Extract subdomain from request
         host = request.get_host().split(':')[0]  # Remove port if present
         host_parts = host.split('.')
@@ -43,19 +91,18 @@ class TenantMiddleware:
             request.tenant = None
             
         elif subdomain:
-            # Tenant subdomain - validate and load tenant
-            try:
-                tenant = Tenant.objects.get(subdomain=subdomain, is_active=True)
-                set_current_tenant(tenant)
-                request.tenant = tenant
-                
-                # Ensure tenant database is loaded in settings
-                from .utils import ensure_tenant_database_loaded
-                ensure_tenant_database_loaded(tenant)
-                
-            except Tenant.DoesNotExist:
+            # Tenant subdomain - validate and load tenant (cached per process)
+            tenant = get_tenant_by_subdomain(subdomain)
+            if tenant is None:
                 # Invalid tenant subdomain
                 return self._render_tenant_error(request, subdomain)
+            
+            set_current_tenant(tenant)
+            request.tenant = tenant
+            
+            # Ensure tenant database is loaded in settings
+            from .utils import ensure_tenant_database_loaded
+            ensure_tenant_database_loaded(tenant)
                 
         else:
             # No subdomain - check if path requires tenant
@@ -78,8 +125,7 @@ class TenantMiddleware:
                 request.tenant = None
                 return self._render_tenant_selection(request)
         
-        response = self.get_response(request)
-        return response
+        return None
     
     def _render_tenant_selection(self, request):
         """Render tenant selection page for main domain access"""
@@ -125,13 +171,24 @@ class TenantMiddleware:
 
 
 def get_current_tenant():
-    """Get the current tenant from thread-local storage"""
-    return getattr(_thread_local, 'tenant', None)
+    """Get the current tenant from context-local storage"""
+    return _current_tenant.get()
 
 
 def set_current_tenant(tenant):
-    """Set the current tenant in thread-local storage"""
-    _thread_local.tenant = tenant
+    """
+    Set the current tenant in context-local storage.
+    
+    Returns:
+        Token that can be passed to reset_current_tenant() to restore the
+        previous tenant.
+    """
+    return _current_tenant.set(tenant)
+
+
+def reset_current_tenant(token):
+    """Restore the tenant that was current before set_current_tenant()"""
+    _current_tenant.reset(token)
 
 
 def tenant_required(view_func):
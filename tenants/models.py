@@ -183,6 +183,9 @@ class Tenant(models.Model):
         if not self.database_name:
             self.database_name = f"sales_{self.subdomain}"
         
+        from .provisioning import check_tenant_database_name
+        check_tenant_database_name(self.database_name)
+        
         is_new = self.pk is None
         super().save(*args, **kwargs)
         
@@ -194,9 +197,10 @@ class Tenant(models.Model):
         """Set up tenant database with migrations and default data"""
         from django.core.management import call_command
         from .utils import ensure_tenant_database_loaded
-        from .middleware import set_current_tenant
+        from .middleware import set_current_tenant, reset_current_tenant
         import os
         
+        token = None
         try:
             print(f"🔧 Setting up tenant database for {self.name}...")
             
@@ -212,14 +216,18 @@ class Tenant(models.Model):
             ensure_tenant_database_loaded(self)
             
             # Set current tenant context
-            set_current_tenant(self)
+            token = set_current_tenant(self)
             
-            # Run migrations for all necessary apps
-            apps_to_migrate = ['contenttypes', 'auth', 'sales_app', 'accounting_app']
+            # Clone the pre-migrated template database when possible,
+            # otherwise run migrations for all necessary apps
+            from .provisioning import TENANT_APPS, clone_template_database
             
-            for app in apps_to_migrate:
-                print(f"   Migrating {app} to {self.database_name}...")
-                call_command('migrate', app, database=self.database_name, verbosity=0)
+            if clone_template_database(self):
+                print(f"   Cloned template database into {self.database_name}")
+            else:
+                for app in TENANT_APPS:
+                    print(f"   Migrating {app} to {self.database_name}...")
+                    call_command('migrate', app, database=self.database_name, verbosity=0)
             
             # Create default groups and superuser
             self.create_default_groups_and_user()
@@ -244,22 +252,29 @@ class Tenant(models.Model):
                 print(f"❌ Error setting up tenant database for {self.name}: {str(e)}")
                 raise
         finally:
-            # Clear tenant context
-            set_current_tenant(None)
+            # Restore the previous tenant context
+            if token is not None:
+                reset_current_tenant(token)
     
     def create_default_groups_and_user(self):
         """Create default groups and superuser for the tenant"""
         from django.contrib.auth.models import User, Group
         
-        # Create default groups
-        default_groups = ['Admin', 'Managers', 'Cashiers']
+        from .provisioning import DEFAULT_GROUPS
         
-        for group_name in default_groups:
-            group, created = Group.objects.using(self.database_name).get_or_create(
-                name=group_name
-            )
-            if created:
-                print(f"   ✓ Created group: {group_name}")
+        # Create default groups (already present in cloned databases)
+        default_groups = DEFAULT_GROUPS
+        existing = set(
+            Group.objects.using(self.database_name)
+            .filter(name__in=default_groups)
+            .values_list('name', flat=True)
+        )
+        missing = [name for name in default_groups if name not in existing]
+        Group.objects.using(self.database_name).bulk_create(
+            [Group(name=name) for name in missing]
+        )
+        for group_name in missing:
+            print(f"   ✓ Created group: {group_name}")
         
         # Create default superuser
         username = "Akyen"
@@ -284,9 +299,9 @@ class Tenant(models.Model):
             user.save(using=self.database_name)
             
             # Add to ALL required groups (Admin, Managers, Cashiers)
+            groups = Group.objects.using(self.database_name).filter(name__in=default_groups)
+            user.groups.add(*groups)
             for group_name in default_groups:
-                group = Group.objects.using(self.database_name).get(name=group_name)
-                user.groups.add(group)
                 print(f"   ✅ Added user to group: {group_name}")
             
             user.save(using=self.database_name)
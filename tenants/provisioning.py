@@ -0,0 +1,220 @@
+"""
+Fast tenant provisioning by cloning a pre-migrated template database.
+
+Running every migration for each new tenant takes tens of seconds. Instead, a
+"golden" template database is kept fully migrated (with the default groups
+already created) and new tenant databases are copied from it:
+
+- SQLite tenants: file copy of tenant_dbs/<template>.sqlite3
+- PostgreSQL tenants on the default server: CREATE DATABASE ... TEMPLATE ...
+
+The template is brought up to date with any new migrations right before it
+is cloned, so clones never lag behind the code.
+"""
+
+import os
+import shutil
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Apps migrated into every tenant database
+TENANT_APPS = ['contenttypes', 'auth', 'sales_app', 'accounting_app']
+
+# Groups created in every tenant database
+DEFAULT_GROUPS = ['Admin', 'Managers', 'Cashiers']
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+POSTGRESQL_ENGINE = 'django.db.backends.postgresql'
+
+
+def get_template_database_name():
+    """Get the alias/name of the template tenant database"""
+    return getattr(settings, 'TENANT_TEMPLATE_DATABASE', 'sales_template')
+
+
+def is_template_database(database_name):
+    """Check if a database alias is the template tenant database"""
+    return database_name == get_template_database_name()
+
+
+def check_tenant_database_name(database_name):
+    """
+    Refuse to use the template database as a tenant database.
+
+    Raises:
+        ValidationError: If ``database_name`` is the template database
+    """
+    if is_template_database(database_name):
+        raise ValidationError(f"Database '{database_name}' is reserved for the tenant template")
+
+
+def _template_tenant(engine):
+    """Unsaved Tenant describing the template database for the given engine"""
+    from .models import Tenant
+    return Tenant(
+        name='Template',
+        subdomain='template',
+        database_name=get_template_database_name(),
+        database_engine=engine,
+    )
+
+
+def load_template_database(engine):
+    """
+    Register the template database alias in Django settings.
+
+    Args:
+        engine: Database engine of the template (SQLite or PostgreSQL)
+
+    Returns:
+        dict: Database configuration of the template
+    """
+    alias = get_template_database_name()
+    config = _template_tenant(engine).get_database_config()
+    current = settings.DATABASES.get(alias)
+    if current is None or current.get('ENGINE') != engine:
+        if current is not None:
+            connections[alias].close()
+        settings.DATABASES[alias] = config
+        if 'sqlite3' in engine:
+            os.makedirs(os.path.dirname(config['NAME']), exist_ok=True)
+    return settings.DATABASES[alias]
+
+
+def refresh_template_database(engine, verbosity=0):
+    """
+    Create the template database if needed and apply pending migrations.
+
+    Args:
+        engine: Database engine of the template (SQLite or PostgreSQL)
+        verbosity: Passed to the migrate command
+
+    Returns:
+        int: Number of migrations applied to the template
+    """
+    from django.contrib.auth.models import Group
+
+    alias = get_template_database_name()
+    if 'postgresql' in engine:
+        _create_postgresql_database(alias)
+    load_template_database(engine)
+
+    connection = connections[alias]
+    try:
+        executor = MigrationExecutor(connection)
+        targets = [
+            key for key in executor.loader.graph.leaf_nodes()
+            if key[0] in TENANT_APPS
+        ]
+        plan = executor.migration_plan(targets)
+        if plan:
+            for app in TENANT_APPS:
+                call_command('migrate', app, database=alias, verbosity=verbosity)
+
+        existing = set(Group.objects.using(alias).values_list('name', flat=True))
+        Group.objects.using(alias).bulk_create(
+            [Group(name=name) for name in DEFAULT_GROUPS if name not in existing]
+        )
+        return len(plan)
+    finally:
+        # SQLite copies and PostgreSQL TEMPLATE both need the template idle
+        connection.close()
+
+
+def can_clone_template(tenant):
+    """
+    Check whether a tenant database can be provisioned from the template.
+
+    SQLite tenants can always be cloned. PostgreSQL tenants can be cloned
+    when they live on the same server as the default database.
+    """
+    if tenant.database_url:
+        return False
+
+    if 'sqlite3' in tenant.database_engine:
+        return True
+
+    default = settings.DATABASES['default']
+    if 'postgresql' in tenant.database_engine and 'postgresql' in default.get('ENGINE', ''):
+        same_host = tenant.database_host in ('', default.get('HOST', ''))
+        same_port = tenant.database_port in (None, default.get('PORT')) or (
+            str(tenant.database_port) == str(default.get('PORT'))
+        )
+        return same_host and same_port
+    return False
+
+
+def clone_template_database(tenant):
+    """
+    Provision a tenant database by cloning the template database.
+
+    Args:
+        tenant: Tenant whose database should be created
+
+    Returns:
+        bool: True if the database was cloned, False if the caller should
+        fall back to running migrations.
+    """
+    check_tenant_database_name(tenant.database_name)
+    if not getattr(settings, 'TENANT_TEMPLATE_CLONING', True) or not can_clone_template(tenant):
+        return False
+
+    if 'sqlite3' in tenant.database_engine:
+        return _clone_sqlite(tenant)
+    return _clone_postgresql(tenant)
+
+
+def _clone_sqlite(tenant):
+    target = tenant.get_database_config()['NAME']
+    if os.path.exists(target) and os.path.getsize(target) > 0:
+        # Never overwrite an existing tenant database
+        return False
+
+    refresh_template_database(SQLITE_ENGINE)
+    source = settings.DATABASES[get_template_database_name()]['NAME']
+
+    if tenant.database_name in settings.DATABASES:
+        connections[tenant.database_name].close()
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(source, target)
+    return True
+
+
+def _clone_postgresql(tenant):
+    from django.db import DatabaseError
+
+    if connections['default'].in_atomic_block:
+        # CREATE DATABASE cannot run inside a transaction (e.g. admin saves)
+        return False
+
+    refresh_template_database(POSTGRESQL_ENGINE)
+    quote = connections['default'].ops.quote_name
+    try:
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                f'CREATE DATABASE {quote(tenant.database_name)} '
+                f'TEMPLATE {quote(get_template_database_name())}'
+            )
+    except DatabaseError as e:
+        # Already exists, template busy or no CREATEDB privilege
+        print(f"   ⚠️  Could not clone template database: {e}")
+        return False
+    return True
+
+
+def _create_postgresql_database(name):
+    from django.db import DatabaseError
+
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', [name])
+        if cursor.fetchone():
+            return
+        try:
+            cursor.execute(f'CREATE DATABASE {connections["default"].ops.quote_name(name)}')
+        except DatabaseError:
+            # Created concurrently by another process
+            pass
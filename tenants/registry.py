@@ -0,0 +1,106 @@
+"""
+In-memory registry of tenant databases.
+
+The database router asks "is this alias a tenant database?" for every model
+of every app during migrate, and resolves tenant connection settings on every
+query. The registry answers both from memory: it loads the Tenant table once
+per process and is refreshed by Tenant signals (and by the Tenant table
+version for changes made in other processes, see cache.py).
+"""
+
+import threading
+
+from django.db import DatabaseError
+
+from .cache import SharedVersionWatcher
+
+
+class TenantDatabaseRegistry:
+    """
+    Per-process map of tenant database alias -> Tenant.
+
+    Database configurations are built lazily from the registered tenants and
+    memoized, so Tenant.get_database_config() runs once per alias.
+    """
+
+    def __init__(self):
+        self._tenants = None
+        self._configs = {}
+        self._lock = threading.RLock()
+        self._watcher = SharedVersionWatcher()
+
+    def _get_tenants(self):
+        with self._lock:
+            if self._watcher.changed():
+                self._reset()
+            if self._tenants is None:
+                from .models import Tenant
+                try:
+                    tenants = {
+                        tenant.database_name: tenant
+                        for tenant in Tenant.objects.using('default').all()
+                    }
+                except DatabaseError:
+                    # Tenant table not created yet (first migrate) - don't memoize
+                    return {}
+                self._tenants = tenants
+            return self._tenants
+
+    def _reset(self):
+        self._tenants = None
+        self._configs = {}
+
+    def invalidate(self):
+        """Drop registered tenants and configs; they reload on next access"""
+        with self._lock:
+            self._reset()
+
+    def is_tenant_database(self, database_name):
+        """
+        Check if a database alias belongs to a tenant.
+
+        Args:
+            database_name: Database alias
+
+        Returns:
+            bool: True if the alias belongs to a registered tenant
+        """
+        return database_name in self._get_tenants()
+
+    def get_tenant(self, database_name):
+        """
+        Get the tenant that owns a database alias.
+
+        Returns:
+            Tenant: The owning tenant, or None if the alias is not a tenant database.
+        """
+        return self._get_tenants().get(database_name)
+
+    def database_names(self):
+        """
+        Get all registered tenant database aliases.
+
+        Returns:
+            list: Tenant database aliases
+        """
+        return list(self._get_tenants())
+
+    def get_database_config(self, tenant):
+        """
+        Get the (memoized) Django database configuration for a tenant.
+
+        Args:
+            tenant: Tenant instance
+
+        Returns:
+            dict: Database configuration suitable for settings.DATABASES
+        """
+        with self._lock:
+            config = self._configs.get(tenant.database_name)
+            if config is None:
+                config = tenant.get_database_config()
+                self._configs[tenant.database_name] = config
+            return config
+
+
+tenant_databases = TenantDatabaseRegistry()
@@ -0,0 +1,33 @@
+"""
+Signal handlers that keep tenant caches in sync with the Tenant table
+and release idle tenant connections.
+"""
+
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_tenant_cache
+from .connections import tenant_connections
+from .models import Tenant
+from .registry import tenant_databases
+
+
+@receiver(post_save, sender=Tenant)
+def tenant_saved(sender, instance, **kwargs):
+    """Drop cached tenants when a tenant is created, updated or deactivated"""
+    tenant_databases.invalidate()
+    invalidate_tenant_cache()
+
+
+@receiver(post_delete, sender=Tenant)
+def tenant_deleted(sender, instance, **kwargs):
+    """Drop cached tenants when a tenant is deleted"""
+    tenant_databases.invalidate()
+    invalidate_tenant_cache()
+
+
+@receiver(request_finished)
+def release_tenant_connections(sender, **kwargs):
+    """Close this thread's connections to evicted or idle tenant databases"""
+    tenant_connections.release()
@@ -0,0 +1,59 @@
+"""
+Test helpers for code that runs in a tenant context.
+
+The test runner only creates test databases for the aliases configured in
+settings.DATABASES, so test tenants use the 'default' test database as their
+tenant database. The router then sends tenant queries to the test database,
+and TestCase rolls them back after every test like any other query.
+"""
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, override_settings
+
+from .cache import tenant_cache
+from .models import Tenant
+from .registry import tenant_databases
+from .utils import switch_tenant_context
+
+
+@override_settings(ALLOWED_HOSTS=['.localhost', 'testserver'])
+class TenantTestCase(TestCase):
+    """
+    TestCase that runs every test in the context of a test tenant.
+
+    ``self.client`` sends requests to the tenant's subdomain, so views go
+    through TenantMiddleware like in production.
+    """
+
+    subdomain = 'testco'
+
+    @classmethod
+    def setUpTestData(cls):
+        # bulk_create skips Tenant.save(), which would provision a database
+        cls.tenant, = Tenant.objects.bulk_create([Tenant(
+            name='Test Company',
+            subdomain=cls.subdomain,
+            database_name=DEFAULT_DB_ALIAS,
+            admin_email=f'admin@{cls.subdomain}.localhost',
+        )])
+
+    def setUp(self):
+        super().setUp()
+        # Cached data of earlier tests is keyed by the same alias and versions
+        cache.clear()
+        tenant_cache.clear()
+        tenant_databases.invalidate()
+        context = switch_tenant_context(self.tenant)
+        context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
+        self.client.defaults['HTTP_HOST'] = f'{self.subdomain}.localhost'
+
+    def login(self, *groups, username='tester'):
+        """Create a user in the given groups and log the test client in"""
+        user = User.objects.create_user(username=username, password='password')
+        for name in groups:
+            user.groups.add(Group.objects.get_or_create(name=name)[0])
+        self.client.force_login(user)
+        return user
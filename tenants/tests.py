@@ -1,3 +1,73 @@
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from .cache import SharedVersionWatcher, TenantCache
+from .models import Tenant
+from .provisioning import clone_template_database
+from .utils import validate_tenant_subdomain
+
+
+def create_tenant(subdomain):
+    # bulk_create skips Tenant.save(), which would provision a database
+    tenant, = Tenant.objects.bulk_create([Tenant(
+        name=subdomain.title(),
+        subdomain=subdomain,
+        database_name=f'sales_{subdomain}',
+        admin_email=f'admin@{subdomain}.localhost',
+    )])
+    return tenant
+
+
+class TenantCacheTests(TestCase):
+    def setUp(self):
+        self.tenant = create_tenant('acme')
+
+    def test_watcher_sees_tenant_changes_of_other_processes(self):
+        watcher = SharedVersionWatcher(interval=0)
+        self.assertFalse(watcher.changed())
+        self.assertFalse(watcher.changed())
+
+        create_tenant('globex')
+        self.assertTrue(watcher.changed())
+        self.assertFalse(watcher.changed())
+
+        Tenant.objects.filter(pk=self.tenant.pk).update(name='Acme Ltd', updated_at=timezone.now())
+        self.assertTrue(watcher.changed())
+
+        Tenant.objects.filter(subdomain='globex').delete()
+        self.assertTrue(watcher.changed())
+
+    def test_cached_tenant_is_dropped_after_a_change_elsewhere(self):
+        cache = TenantCache(ttl=300, max_size=10, version_check_interval=0)
+        self.assertEqual(cache.get('acme'), self.tenant)
+
+        # Deactivated by another process: no signal reaches this one
+        Tenant.objects.filter(pk=self.tenant.pk).update(is_active=False, updated_at=timezone.now())
+
+        self.assertIsNone(cache.get('acme'))
+
+    def test_cached_tenant_is_served_between_version_checks(self):
+        cache = TenantCache(ttl=300, max_size=10, version_check_interval=300)
+        cache.get('acme')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get('acme'), self.tenant)
+
+
+class TemplateDatabaseTests(TestCase):
+    def test_template_subdomains_are_reserved(self):
+        self.assertEqual(validate_tenant_subdomain('template'), (False, "'template' is a reserved subdomain"))
+        with self.settings(TENANT_TEMPLATE_DATABASE='sales_golden'):
+            self.assertFalse(validate_tenant_subdomain('golden')[0])
+        self.assertEqual(validate_tenant_subdomain('acme'), (True, ''))
+
+    def test_tenant_cannot_use_the_template_database(self):
+        tenant = Tenant(name='Template Co', subdomain='template', admin_email='admin@template.localhost')
+
+        with self.assertRaises(ValidationError):
+            tenant.save()
+
+        self.assertFalse(Tenant.objects.exists())
+        with self.assertRaises(ValidationError):
+            clone_template_database(tenant)
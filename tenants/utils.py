@@ -7,6 +7,9 @@ from django.db import connections
 from django.db import models
 from .models import Tenant
 from .middleware import get_current_tenant
+from .registry import tenant_databases
+from .connections import tenant_connections
+from .provisioning import is_template_database
 
 
 def get_tenant_database_key(tenant=None):
@@ -71,6 +74,35 @@ def get_tenant_connection(tenant=None):
     return connections['default']
 
 
+class TenantContext:
+    """
+    Context manager that temporarily switches the current tenant.
+    
+    Supports both ``with`` and ``async with``. The previous tenant is restored
+    through a context variable token, so nested and concurrent contexts
+    (threads or asyncio tasks) never overwrite each other.
+    """
+    
+    def __init__(self, tenant):
+        self.new_tenant = tenant
+        self._tokens = []
+    
+    def __enter__(self):
+        from .middleware import set_current_tenant
+        self._tokens.append(set_current_tenant(self.new_tenant))
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        from .middleware import reset_current_tenant
+        reset_current_tenant(self._tokens.pop())
+    
+    async def __aenter__(self):
+        return self.__enter__()
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
 def switch_tenant_context(tenant):
     """
     Context manager to temporarily switch tenant context.
@@ -79,22 +111,10 @@ def switch_tenant_context(tenant):
         with switch_tenant_context(some_tenant):
             # Operations here use some_tenant's database
             invoices = Invoice.objects.all()
-    """
-    from .middleware import set_current_tenant
-    
-    class TenantContext:
-        def __init__(self, new_tenant):
-            self.new_tenant = new_tenant
-            self.original_tenant = None
-        
-        def __enter__(self):
-            self.original_tenant = get_current_tenant()
-            set_current_tenant(self.new_tenant)
-            return self
         
-        def __exit__(self, exc_type, exc_val, exc_tb):
-            set_current_tenant(self.original_tenant)
-    
+        async with switch_tenant_context(some_tenant):
+            invoices = [i async for i in Invoice.objects.all()]
+    """
     return TenantContext(tenant)
 
 
@@ -105,7 +125,7 @@ def get_all_tenant_databases():
     Returns:
         list: List of tenant database names
     """
-    return list(Tenant.objects.values_list('database_name', flat=True))
+    return tenant_databases.database_names()
 
 
 def is_tenant_database(database_name):
@@ -118,7 +138,7 @@ def is_tenant_database(database_name):
     Returns:
         bool: True if database belongs to a tenant
     """
-    return Tenant.objects.filter(database_name=database_name).exists()
+    return tenant_databases.is_tenant_database(database_name)
 
 
 def validate_tenant_subdomain(subdomain):
@@ -143,8 +163,9 @@ def validate_tenant_subdomain(subdomain):
         return False, "Subdomain must contain only lowercase letters, numbers, and hyphens"
     
     # Check for reserved subdomains
-    reserved = ['www', 'admin', 'api', 'mail', 'ftp', 'localhost']
-    if subdomain in reserved:
+    reserved = ['www', 'admin', 'api', 'mail', 'ftp', 'localhost', 'template']
+    # The tenant database would be the template database (see provisioning.py)
+    if subdomain in reserved or is_template_database(f"sales_{subdomain}"):
         return False, f"'{subdomain}' is a reserved subdomain"
     
     # Check if subdomain already exists
@@ -176,9 +197,15 @@ def get_tenant_summary():
 
 
 def ensure_tenant_database_loaded(tenant):
-    """Ensure tenant's database configuration is loaded in Django settings"""
+    """
+    Ensure tenant's database configuration is loaded in Django settings
+    and mark the tenant's connection as recently used.
+    """
+    if tenant:
+        tenant_connections.touch(tenant.database_name)
+    
     if tenant and tenant.database_name not in settings.DATABASES:
-        database_config = tenant.get_database_config()
+        database_config = tenant_databases.get_database_config(tenant)
         settings.DATABASES[tenant.database_name] = database_config
         
         # Create database directory for SQLite if needed
@@ -190,6 +217,16 @@ def ensure_tenant_database_loaded(tenant):
                 os.makedirs(db_dir, exist_ok=True)
 
 
+def get_tenant_connection_stats():
+    """
+    Get tenant connection pool statistics for this process.
+    
+    Returns:
+        dict: See TenantConnectionManager.stats()
+    """
+    return tenant_connections.stats()
+
+
 def load_all_tenant_databases():
     """Load all tenant databases into Django settings (useful for startup)"""
     for tenant in Tenant.objects.filter(is_active=True):